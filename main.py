@@ -5,14 +5,17 @@ from pathlib import Path
 from typing import Dict,Tuple,Callable,Optional
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from llama_cpp import Llama
-import ctypes
-
-try:import psutil
-except:psutil=None
-try:
-    import pennylane as qml
-    from pennylane import numpy as pnp
-except:qml=pnp=None
+import sys
+sys.path.insert(0,str(Path(__file__).parent/"python-backend"))
+from model_container import is_container,convert_legacy,open_decrypted_model,model_fingerprint
+from quantum_engine import entropic_score
+from metrics_sampler import SAMPLER,collect_system_metrics
+from scan_history import init_db,get_history
+from token_stream import stream_generate,continuation_prompt
+from scan_scheduler import ScanScheduler
+from memory_profile import plan_load,count_prompt_tokens
+from embedded_worker import start_embedded_worker
+from punkd import PunkdAnalyzer,PunkdPatch,analyze as punkd_engine_analyze,markers as punkd_markers,widest_markers
 
 from kivy.app import App
 from kivy.uix.boxlayout import BoxLayout
@@ -33,28 +36,23 @@ if platform=="android":
     Context = autoclass('android.content.Context')
     LocationListener = autoclass('android.location.LocationListener')
 
-# Embedded Python 3.14
+# Embedded Python 3.14: one persistent scan worker (python-backend/embedded_worker.py).
+# It loads the model once and streams tokens and the verdict back over a JSON-lines pipe.
 def load_py314():
-    lib_path = Path(__file__).parent / "data" / "python314" / "lib" / "libpython3.14.so"
+    root = Path(__file__).parent / "data" / "python314"
+    lib_path = root / "lib" / "libpython3.14.so"
     if not lib_path.exists(): return None
-    lib = ctypes.CDLL(str(lib_path))
-    lib.Py_Initialize()
-    stdlib = str(Path(__file__).parent / "data" / "python314" / "stdlib")
-    lib.PyRun_SimpleString(f"import sys; sys.path.insert(0, '{stdlib}')".encode())
-    return lib
+    try: return start_embedded_worker(lib_path, root / "stdlib")
+    except Exception: return None
 
 py314 = load_py314()
-def run_py314(code: str):
-    if py314:
-        try: py314.PyRun_SimpleString(code.encode())
-        except: pass
 
 # Constants
 MODEL_FILE="llama3-small-Q3_K_M.gguf"
 MODELS_DIR=Path("models")
 MODEL_PATH=MODELS_DIR/MODEL_FILE
 ENCRYPTED_MODEL=MODEL_PATH.with_suffix(".aes")
-DB_PATH=Path("chat_history.db.aes")
+DB_PATH=Path("scan_history.db")
 KEY_PATH=Path(".enc_key")
 MODELS_DIR.mkdir(parents=True,exist_ok=True)
 
@@ -62,60 +60,38 @@ MODELS_DIR.mkdir(parents=True,exist_ok=True)
 def get_key()->bytes:
     if not KEY_PATH.exists():KEY_PATH.write_bytes(AESGCM.generate_key(256))
     return KEY_PATH.read_bytes()[:32]
-def decrypt_file(s:Path,d:Path,k:bytes):d.write_bytes(AESGCM(k).decrypt(s.read_bytes()[:12],s.read_bytes()[12:],None))
+def open_model(k:bytes)->Path:
+    # Segmented container -> memfd/tmpfs mapping; plaintext only hits MODEL_PATH as a last resort.
+    if not ENCRYPTED_MODEL.exists():return MODEL_PATH
+    if not is_container(ENCRYPTED_MODEL):convert_legacy(ENCRYPTED_MODEL,ENCRYPTED_MODEL,k)
+    return open_decrypted_model(ENCRYPTED_MODEL,k,fallback=MODEL_PATH)
 
 # Metrics
-def collect_system_metrics()->Dict[str,float]:
-    c=m=None
-    if psutil:
-        try:c=psutil.cpu_percent(0.1)/100;m=psutil.virtual_memory().percent/100
-        except:pass
-    return {"cpu":float(c or 0.3),"mem":float(m or 0.4),"load1":0.2,"temp":0.5,"proc":0.1}
 def metrics_to_rgb(m:dict)->Tuple[float,float,float]:
     r=m["cpu"]*2.2;g=m["mem"]*1.9;b=m["temp"]*1.5;mx=max(r,g,b,1.0);return(r/mx,g/mx,b/mx)
-def pennylane_entropic_score(rgb:Tuple[float,float,float],shots:int=256)->float:
-    if qml is None:return sum(rgb)/3+random.random()*0.15-0.075
-    dev=qml.device("default.qubit",wires=2,shots=shots)
-    @qml.qnode(dev)
-    def circuit(a,b,c):
-        qml.RX(a*math.pi,wires=0);qml.RY(b*math.pi,wires=1);qml.CNOT(wires=[0,1])
-        qml.RZ(c*math.pi,wires=1);qml.RX((a+b+c)*math.pi/3,wires=0)
-        return qml.expval(qml.PauliZ(0)),qml.expval(qml.PauliZ(1))
-    try:e0,e1=circuit(*rgb);s=1.0/(1.0+math.exp(-9.0*(((e0+1)/2*0.65+(e1+1)/2*0.35)-0.5)));return float(s)
+def pennylane_entropic_score(rgb:Tuple[float,float,float],shots:Optional[int]=None)->float:
+    try:return entropic_score(rgb,shots=shots)
     except:return 0.5
 def entropic_summary_text(score:float)->str:
     if score>=0.78:return f"CHAOS RESONANCE {score:.3f}"
     if score>=0.55:return f"TURBULENT FIELD {score:.3f}"
     return f"STABLE MANIFOLD {score:.3f}"
 
-# PUNKD & Generation
+# PUNKD & Generation (engine: python-backend/punkd.py)
 def punkd_analyze(text:str,top_n:int=16)->Dict[str,float]:
-    toks=re.findall(r"[a-zA-Z0-9_]+",text.lower())
-    freq={};[freq.__setitem__(t,freq.get(t,0)+1)for t in toks]
-    boost={"ice":2.8,"wet":2.5,"snow":2.9,"fog":2.3,"flood":3.0,"construction":2.2,"debris":2.4,"animal":2.1,"blackice":4.0,"hydroplane":3.5}
-    scored={t:c*boost.get(t,1.0)for t,c in freq.items()}
-    top=sorted(scored.items(),key=lambda x:-x[1])[:top_n]
-    if not top:return {}
-    mx=top[0][1]
-    return {k:float(v/mx)for k,v in top}
+    return punkd_engine_analyze(text,top_n)
 def punkd_apply(prompt:str,weights:Dict[str,float],profile:str="balanced")->Tuple[str,float]:
-    if not weights:return prompt,1.0
-    mean=sum(weights.values())/len(weights)
-    mul_map={"conservative":0.7,"balanced":1.0,"aggressive":1.6}
-    mul=mul_map.get(profile,1.0)
-    adj=1.0+(mean-0.5)*1.2*mul
-    adj=max(0.6,min(2.2,adj))
-    markers=" ".join([f"<HAZ:{k}:{v:.2f}>"for k,v in sorted(weights.items(),key=lambda x:-x[1])[:8]])
-    return prompt+f"\n\n[PUNKD HAZARD BOOST] {markers}",adj
+    suffix,adj=punkd_markers(weights,profile)
+    return prompt+suffix,adj
 def chunked_generate(llm:Llama,prompt:str,max_total_tokens:int=256,chunk_tokens:int=64,
                     base_temperature:float=0.18,punkd_profile:str="balanced",
                     streaming_callback:Optional[Callable[[str],None]]=None)->str:
     assembled="";cur_prompt=prompt
-    token_weights=punkd_analyze(prompt,top_n=16)
+    patch=PunkdPatch(PunkdAnalyzer(prompt),profile=punkd_profile)
     iterations=max(1,(max_total_tokens+chunk_tokens-1)//chunk_tokens)
     prev_tail=""
     for i in range(iterations):
-        patched_prompt,mult=punkd_apply(cur_prompt,token_weights,profile=punkd_profile)
+        patched_prompt,mult=patch(cur_prompt)
         temp=max(0.01,min(2.0,base_temperature*mult))
         out=llm(patched_prompt,max_tokens=chunk_tokens,temperature=temp,stop=["Low","Medium","High","\n","\r"])
         text=""
@@ -131,7 +107,7 @@ def chunked_generate(llm:Llama,prompt:str,max_total_tokens:int=256,chunk_tokens:
             if prev_tail.endswith(text[:olen]):
                 overlap=olen;break
         append_text=text[overlap:]if overlap else text
-        assembled+=append_text
+        assembled+=append_text;patch.feed(append_text)
         prev_tail=assembled[-140:]if len(assembled)>140 else assembled
         if streaming_callback:streaming_callback(append_text)
         if assembled.strip().endswith(("Low","Medium","High")):break
@@ -209,6 +185,8 @@ class RiskWheel(BoxLayout):
 class ScannerScreen(Screen):
     def __init__(self,app,**kwargs):
         super().__init__(**kwargs);self.app=app;self.lat=self.lon=None
+        # one scan in flight; GPS fixes coalesce into the latest pending one
+        self.scheduler=ScanScheduler(self._scan,self._scan_done)
         l=BoxLayout(orientation="vertical",spacing=25,padding=20)
         l.add_widget(MDLabel(text="HYDRA-9 QUANTUM SCAN",halign="center",font_style="H5"))
         self.coords=MDLabel(text="Acquiring GPS lock...",halign="center",font_style="Caption")
@@ -238,41 +216,64 @@ class ScannerScreen(Screen):
     def on_gps(self,lat,lon):
         self.lat,self.lon=lat,lon
         self.coords.text=f"LOCKED\n{lat:.6f}, {lon:.6f}"
-        self.run_scan()
+        self.run_scan(force=False)
 
-    def run_scan(self,*_):
+    def run_scan(self,*_,force:bool=True):
         if not self.lat:return
-        self.spin.active=True
-        threading.Thread(target=self._scan,daemon=True).start()
+        if self.scheduler.submit(self.lat,self.lon,force=force):self.spin.active=True
+
+    def on_leave(self):
+        self.scheduler.close();self.spin.active=False
+
+    def _show_partial(self,text:str):
+        Clock.schedule_once(lambda dt:setattr(self.result,"markup",False))
+        Clock.schedule_once(lambda dt:setattr(self.result,"text",text[-90:]))
+
+    def _show_verdict(self,result:str):
+        color={"Low":"00ff00","Medium":"ffff00","High":"ff0000"}[result]
+        Clock.schedule_once(lambda dt:setattr(self.result,"markup",True))
+        Clock.schedule_once(lambda dt:setattr(self.result,"text",f"[color={color}][size=80][b]{result}[/b][/size][/color]"))
+        Clock.schedule_once(lambda dt:self.wheel.spin(result))
 
-    def _scan(self):
+    def _scan(self,lat:float,lon:float,should_stop:Callable[[],bool])->Optional[str]:
+        # runs on the scheduler thread; returns None when a newer fix superseded it
         try:
+            if py314 and py314.alive:return self._scan_py314(lat,lon,should_stop)
             k=self.app.key
-            if ENCRYPTED_MODEL.exists():decrypt_file(ENCRYPTED_MODEL,MODEL_PATH,k)
-            prompt=build_road_scanner_prompt(self.lat,self.lon)
-            code=f'''
-from llama_cpp import Llama
-llm=Llama(model_path="{MODEL_PATH}",n_ctx=2048,n_threads=4)
-def stream(t):print("STREAM:",t)
-result=chunked_generate(llm,"{prompt.replace('"','\\"')}",streaming_callback=stream)
-print("FINAL:",result)
-'''
-            run_py314(code)
-            result="Medium"
-            if "low" in result.lower():result="Low"
-            elif "high" in result.lower():result="High"
-            color={"Low":"00ff00","Medium":"ffff00","High":"ff0000"}[result]
-            Clock.schedule_once(lambda dt:setattr(self.result,"markup",True))
-            Clock.schedule_once(lambda dt:setattr(self.result,"text",f"[color={color}][size=80][b]{result}[/b][/size][/color]"))
-            Clock.schedule_once(lambda dt:self.wheel.spin(result))
-            if MODEL_PATH.exists():
-                from cryptography.hazmat.primitives.ciphers.aead import AESGCM
-                encrypt_file(MODEL_PATH,ENCRYPTED_MODEL,k)
-                MODEL_PATH.unlink()
+            llm=self.app.get_llm(open_model(k))
+            prompt=build_road_scanner_prompt(lat,lon)
+            patch=PunkdPatch(PunkdAnalyzer(prompt),profile="balanced")
+            partial="";result=None
+            # tokens are shown as they decode; the verdict lands as soon as its label token is sampled
+            budget=self.app.llm_profile.get("max_tokens",256)
+            for ev in stream_generate(llm,prompt,max_total_tokens=budget,patch=patch,should_stop=should_stop):
+                if ev.get("done"):
+                    result=ev["verdict"]
+                    if not result and not should_stop():
+                        t=ev["text"].lower();result="Low" if "low" in t else "High" if "high" in t else "Medium"
+                    break
+                partial+=ev["token"];patch.feed(ev["token"]);self._show_partial(partial)
+            return None if should_stop() else result
         except Exception as e:
             Clock.schedule_once(lambda dt:setattr(self.result,"text",f"QUANTUM COLLAPSE: {e}"))
+            return None
         finally:
-            Clock.schedule_once(lambda dt:setattr(self.spin,"active",False))
+            if not should_stop():Clock.schedule_once(lambda dt:setattr(self.spin,"active",False))
+
+    def _scan_py314(self,lat:float,lon:float,should_stop:Callable[[],bool])->Optional[str]:
+        # same scan in the embedded worker; only the request and its events cross the pipe
+        partial="";final={}
+        for ev in py314.scan(lat,lon,model=open_model(self.app.key),fingerprint=self.app.model_fingerprint(),should_stop=should_stop):
+            if ev.get("done"):final=ev;break
+            partial+=ev["token"];self._show_partial(partial)
+        if final.get("verdict")=="ERROR":raise RuntimeError(final.get("entropy"))
+        return None if should_stop() or final.get("verdict") not in ("Low","Medium","High") else final["verdict"]
+
+    def _scan_done(self,lat:float,lon:float,result:Optional[str]):
+        if not result:return
+        self._show_verdict(result)
+        history=get_history()
+        if history:history.record(lat,lon,{"verdict":result},metrics=collect_system_metrics())
 
 class MainScreen(Screen):
     def __init__(self,app,**kwargs):
@@ -289,11 +290,36 @@ class HydraApp(MDApp):
         self.theme_cls.theme_style="Dark"
         self.theme_cls.primary_palette="DeepPurple"
         self.key=get_key()
+        self._llm=None;self._llm_path=None;self._llm_lock=threading.Lock();self.llm_profile={}
+        SAMPLER.start()
         self.sm=ScreenManager()
         self.sm.add_widget(MainScreen(self,name="main"))
         self.sm.add_widget(ScannerScreen(self,name="scanner"))
         return self.sm
-    def on_start(self):asyncio.run(init_db(self.key))
+    def get_llm(self,model_path:Path)->Llama:
+        # one resident model per app; reloaded only when the mapped path changes
+        with self._llm_lock:
+            if self._llm is None or self._llm_path!=model_path:
+                self._llm=None
+                # context sized to the widest prompt as a chunk sees it (continuation
+                # wrapper + PUNKD markers); MemoryError instead of an OOM kill
+                prompt=build_road_scanner_prompt(-89.999999,-179.999999)
+                tokens=count_prompt_tokens(Llama,model_path,continuation_prompt(prompt,"")+widest_markers(prompt))
+                params,self.llm_profile=plan_load(model_path,tokens)
+                self._llm=Llama(model_path=str(model_path),**params)
+                self._llm_path=model_path
+            return self._llm
+    def model_fingerprint(self)->Optional[bytes]:
+        src=ENCRYPTED_MODEL if ENCRYPTED_MODEL.exists() else MODEL_PATH
+        return model_fingerprint(src) if src.exists() else None
+    def on_start(self):
+        asyncio.run(init_db(self.key,DB_PATH))
+        # load the worker's model while the main screen is up
+        if py314:threading.Thread(target=lambda:py314.warm(open_model(self.key),self.model_fingerprint()),daemon=True).start()
+    def on_stop(self):
+        if py314:py314.close()
+        history=get_history()
+        if history:history.close()
 
 if __name__=="__main__":
     HydraApp().run()
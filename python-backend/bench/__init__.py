@@ -0,0 +1,8 @@
+# python-backend/bench
+# Scan-pipeline benchmarks against a deterministic stand-in Llama.
+# Run from python-backend/:  python -m bench [--save base.json] [--compare base.json]
+#                            python -m bench.startup  (cold-start import times)
+#                            python -m bench.replay TRACK  (GPS-track load replay)
+
+from .fake_llama import FakeLlama, install_stub_llama_cpp
+from .runner import StageTimer, run_benchmarks, compare
@@ -0,0 +1,169 @@
+# python-backend/bench/fake_llama.py
+# Deterministic stand-in for llama_cpp.Llama. Tokenizes on words, keeps a
+# fake KV cache so prefix reuse behaves like llama-cpp's longest-prefix match,
+# and sleeps a configurable time per evaluated / generated token.
+
+import sys
+import time
+import types
+import zlib
+from itertools import cycle
+from typing import Iterable, List, Optional, Sequence
+
+import numpy as np
+
+N_VOCAB = 32000
+BOS_ID, EOS_ID = 1, 0
+DEFAULT_SCRIPT = (
+    "road surface reads damp with moderate traffic and clear sightlines along this segment",
+    "hazard resonance stays inside expected bounds for the current segment so risk is Low",
+    "High",
+)
+
+class FakeLlamaState:
+    def __init__(self, input_ids, scores, n_tokens, llama_state, llama_state_size, seed):
+        self.input_ids = input_ids
+        self.scores = scores
+        self.n_tokens = n_tokens
+        self.llama_state = llama_state
+        self.llama_state_size = llama_state_size
+        self.seed = seed
+
+class FakeLlama:
+    # Class-level knobs so code that constructs Llama(model_path=...) itself
+    # picks them up; FakeLlama.configure() sets them for a run.
+    prompt_token_latency = 0.0002
+    gen_token_latency = 0.004
+    load_latency = 0.05
+    script: Sequence[str] = DEFAULT_SCRIPT
+    _words = {}
+
+    @classmethod
+    def configure(cls, prompt_token_latency: Optional[float] = None, gen_token_latency: Optional[float] = None,
+                  load_latency: Optional[float] = None, script: Optional[Iterable[str]] = None):
+        if prompt_token_latency is not None: cls.prompt_token_latency = prompt_token_latency
+        if gen_token_latency is not None: cls.gen_token_latency = gen_token_latency
+        if load_latency is not None: cls.load_latency = load_latency
+        if script is not None: cls.script = tuple(script)
+
+    def __init__(self, model_path: str = "", n_ctx: int = 2048, n_threads: int = 4, n_batch: int = 512, **kwargs):
+        time.sleep(self.load_latency)
+        self.model_path = model_path
+        self._n_ctx = n_ctx
+        self.n_batch = n_batch
+        self.input_ids = np.zeros(n_ctx, dtype=np.intc)
+        self.n_tokens = 0
+        self._script = cycle(self.script)
+        self.evaluated = self.generated = 0
+
+    # --- llama_cpp.Llama surface ---
+    def n_ctx(self) -> int:
+        return self._n_ctx
+
+    def n_vocab(self) -> int:
+        return N_VOCAB
+
+    def token_eos(self) -> int:
+        return EOS_ID
+
+    def tokenize(self, text: bytes, add_bos: bool = True, special: bool = False) -> List[int]:
+        words = text.decode("utf-8", "ignore").replace("\n", " \n ").split(" ")
+        toks = []
+        for w in words:
+            if w:
+                t = zlib.crc32(w.encode()) % (N_VOCAB - 2) + 2
+                self._words.setdefault(t, w)
+                toks.append(t)
+        return ([BOS_ID] if add_bos else []) + toks
+
+    def detokenize(self, tokens: List[int], prev_tokens=None, special: bool = False) -> bytes:
+        # one leading space per word, like a sentencepiece vocabulary
+        return "".join(w if w == "\n" else " " + w for w in (self._words.get(t, "") for t in tokens) if w).encode()
+
+    def reset(self):
+        self.n_tokens = 0
+
+    def eval(self, tokens: Sequence[int]):
+        tokens = list(tokens)[: self._n_ctx - self.n_tokens]
+        time.sleep(len(tokens) * self.prompt_token_latency)
+        self.input_ids[self.n_tokens:self.n_tokens + len(tokens)] = tokens
+        self.n_tokens += len(tokens)
+        self.evaluated += len(tokens)
+
+    def save_state(self) -> FakeLlamaState:
+        blob = self.input_ids[: self.n_tokens].tobytes()
+        return FakeLlamaState(self.input_ids.copy(), np.zeros((1, N_VOCAB), dtype=np.single), self.n_tokens,
+                              blob, len(blob), 0)
+
+    def load_state(self, state: FakeLlamaState):
+        self.input_ids = state.input_ids.copy()
+        self.n_tokens = state.n_tokens
+
+    def _prefill(self, prompt: str):
+        self._prefill_tokens(self.tokenize(prompt.encode("utf-8")))
+
+    def _prefill_tokens(self, tokens: List[int]):
+        common = 0
+        for a, b in zip(self.input_ids[: self.n_tokens], tokens):
+            if a != b:
+                break
+            common += 1
+        self.n_tokens = min(common, len(tokens) - 1)
+        self.eval(tokens[self.n_tokens:])
+
+    def _completion(self, text: str, n_prompt: int = 0):
+        n = len(self.tokenize(text.encode("utf-8"), add_bos=False))
+        time.sleep(n * self.gen_token_latency)
+        self.generated += n
+        return {"choices": [{"text": text, "index": 0, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": n_prompt, "completion_tokens": n}}
+
+    def __call__(self, prompt: str, max_tokens: int = 16, temperature: float = 0.8, stop=None,
+                 logits_processor=None, stream: bool = False, **kwargs):
+        self._prefill(prompt)
+        text = next(self._script)
+        if logits_processor:
+            scores = np.zeros(N_VOCAB, dtype=np.single)
+            scores[self.tokenize(text.encode(), add_bos=False)[0]] = 4.0
+            for proc in logits_processor:
+                scores = proc(self.input_ids[: self.n_tokens], scores)
+            text = text.split()[0]
+        text = " ".join(text.split(" ")[:max_tokens])
+        if stop:
+            # like llama-cpp, cut before the earliest stop string
+            cut = min((text.index(s) for s in stop if s in text), default=len(text))
+            text = text[:cut]
+        if not stream:
+            return self._completion(text, self.n_tokens)
+        return self._stream(text.split(" ") if text else [])
+
+    def generate(self, tokens: Sequence[int], temp: float = 0.8, **kwargs):
+        self._prefill_tokens(list(tokens))
+        for t in self.tokenize(next(self._script).encode("utf-8"), add_bos=False) + [EOS_ID]:
+            time.sleep(self.gen_token_latency)
+            self.generated += 1
+            if self.n_tokens < self._n_ctx:
+                self.input_ids[self.n_tokens] = t
+                self.n_tokens += 1
+            yield t
+
+    def _stream(self, words):
+        for i, w in enumerate(words):
+            time.sleep(self.gen_token_latency)
+            self.generated += 1
+            yield {"choices": [{"text": (" " if i else "") + w, "index": 0,
+                                "finish_reason": "stop" if i == len(words) - 1 else None}]}
+
+def install_stub_llama_cpp():
+    # Lets the backend import on a box without llama-cpp-python installed.
+    try:
+        import llama_cpp  # noqa: F401
+        return False
+    except ImportError:
+        pass
+    mod = types.ModuleType("llama_cpp")
+    mod.Llama = FakeLlama
+    mod.LlamaState = FakeLlamaState
+    mod.LogitsProcessorList = list
+    sys.modules["llama_cpp"] = mod
+    return True
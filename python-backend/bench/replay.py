@@ -0,0 +1,327 @@
+# python-backend/bench/replay.py
+# Replays a recorded GPS track (CSV / GPX / JSONL of timestamped lat/lon)
+# against the scan pipeline at the original pace or N x faster, either one
+# thread per fix (how the app used to call run_quantum_scan) or through the
+# single-flight ScanScheduler. Reports end-to-end latency percentiles,
+# skipped / coalesced / cancelled fixes, throughput and RSS over time as JSON.
+# Run from python-backend/:
+#   python -m bench.replay track.gpx [--speed 4] [--driver scheduler] [--real] [--save r.json]
+#   python -m bench.replay --synthetic 120 --speed 10 --compare r.json
+
+import csv
+import sys
+import json
+import math
+import time
+import argparse
+import platform
+import tempfile
+import threading
+import xml.etree.ElementTree as ET
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .fake_llama import FakeLlama
+from .runner import BACKEND_DIR, close_history, load_backend, peak_rss_kb
+
+Fix = Tuple[float, float, float]  # seconds since the first fix, lat, lon
+_TIME_KEYS = ("t", "ts", "time", "timestamp")
+
+# === TRACKS ===
+def _parse_time(v) -> Optional[float]:
+    if v is None or v == "":
+        return None
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return datetime.fromisoformat(str(v).replace("Z", "+00:00")).timestamp()
+
+def _relative(rows: List[Tuple[Optional[float], float, float]]) -> List[Fix]:
+    # Seconds since the first timestamped fix; fixes without a timestamp
+    # follow the previous one by a second.
+    t0 = next((t for t, _, _ in rows if t is not None), None)
+    out: List[Fix] = []
+    for t, lat, lon in rows:
+        rel = (out[-1][0] + 1.0 if out else 0.0) if t is None else t - t0
+        out.append((rel, lat, lon))
+    return sorted(out, key=lambda f: f[0])
+
+def load_track(path: Path) -> List[Fix]:
+    suffix = path.suffix.lower()
+    rows: List[Tuple[Optional[float], float, float]] = []
+    if suffix == ".gpx":
+        for el in ET.parse(path).getroot().iter():
+            if el.tag.rsplit("}", 1)[-1] in ("trkpt", "rtept", "wpt"):
+                t = next((c.text for c in el if c.tag.rsplit("}", 1)[-1] == "time"), None)
+                rows.append((_parse_time(t), float(el.get("lat")), float(el.get("lon"))))
+    elif suffix in (".jsonl", ".ndjson", ".json"):
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    d = json.loads(line)
+                    t = next((d[k] for k in _TIME_KEYS if k in d), None)
+                    rows.append((_parse_time(t), float(d["lat"]), float(d.get("lon", d.get("lng")))))
+    else:
+        with open(path, newline="") as f:
+            for d in csv.DictReader(f):
+                d = {k.strip().lower(): v for k, v in d.items() if k}
+                t = next((d[k] for k in _TIME_KEYS if k in d), None)
+                rows.append((_parse_time(t), float(d.get("lat", d.get("latitude"))),
+                             float(d.get("lon", d.get("lng", d.get("longitude"))))))
+    return _relative(rows)
+
+def synthetic_track(n: int, speed_mps: float = 15.0, lat: float = 40.7128, lon: float = -74.0060) -> List[Fix]:
+    # A straight drive north-east with one fix per second.
+    step = speed_mps / 111320.0
+    return [(float(i), lat + i * step, lon + i * step / math.cos(math.radians(lat))) for i in range(n)]
+
+# === RSS ===
+class RssSampler:
+    def __init__(self, interval: float = 0.5):
+        self.interval = interval
+        self.series: List[Tuple[float, int]] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def rss_kb() -> int:
+        try:
+            with open("/proc/self/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1])
+        except OSError:
+            pass
+        return peak_rss_kb()
+
+    def start(self):
+        t0 = time.perf_counter()
+        def run():
+            while not self._stop.is_set():
+                self.series.append((round(time.perf_counter() - t0, 3), self.rss_kb()))
+                self._stop.wait(self.interval)
+        self._thread = threading.Thread(target=run, name="qrs-replay-rss", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+# === DRIVERS ===
+class _Collector:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies: List[float] = []
+        self.verdicts: Dict[str, int] = {}
+        self.tiers: Dict[str, int] = {}
+        self.cached = self.errors = 0
+
+    def done(self, arrived: float, result: Dict[str, object]):
+        with self.lock:
+            self.latencies.append(time.perf_counter() - arrived)
+            verdict = str(result.get("verdict"))
+            self.verdicts[verdict] = self.verdicts.get(verdict, 0) + 1
+            if "tier" in result:
+                self.tiers[result["tier"]] = self.tiers.get(result["tier"], 0) + 1
+            self.cached += bool(result.get("cached"))
+            self.errors += verdict == "ERROR"
+
+def _pace(track: List[Fix], speed: float):
+    # Yields (arrival time, lat, lon) as each fix becomes due.
+    start = time.perf_counter()
+    for t, lat, lon in track:
+        due = start + t / speed
+        delay = due - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        yield time.perf_counter(), lat, lon
+
+def drive_threads(backend, track: List[Fix], speed: float, mode: str, col: _Collector) -> Dict[str, int]:
+    threads = []
+    for arrived, lat, lon in _pace(track, speed):
+        def one(arrived=arrived, lat=lat, lon=lon):
+            col.done(arrived, backend.run_quantum_scan(lat, lon, mode=mode))
+        th = threading.Thread(target=one, daemon=True)
+        th.start()
+        threads.append(th)
+    for th in threads:
+        th.join()
+    return {"fixes": len(track), "started": len(track), "skipped": 0, "coalesced": 0, "cancelled": 0}
+
+def drive_scheduler(backend, track: List[Fix], speed: float, mode: str, col: _Collector,
+                    sched_opts: Dict[str, float]) -> Dict[str, int]:
+    import scan_scheduler
+    arrivals: Dict[Tuple[float, float], float] = {}
+    # scheduler times are in track seconds, so they shrink with the speed-up
+    opts = {"min_distance_m": sched_opts.get("min_distance_m", scan_scheduler.MIN_DISTANCE_M),
+            "min_interval_s": sched_opts.get("min_interval_s", scan_scheduler.MIN_INTERVAL_S) / speed,
+            "refresh_s": sched_opts.get("refresh_s", scan_scheduler.REFRESH_S) / speed}
+
+    def run(lat, lon, should_stop):
+        if mode == "classify":
+            return backend.run_quantum_scan(lat, lon, mode=mode)
+        final = {}
+        for ev in backend.iter_quantum_scan(lat, lon, should_stop=should_stop):
+            if "verdict" in ev:
+                final = ev
+        return final
+
+    sched = scan_scheduler.ScanScheduler(run, lambda lat, lon, r: col.done(arrivals[(lat, lon)], r), **opts)
+    for arrived, lat, lon in _pace(track, speed):
+        arrivals[(lat, lon)] = arrived
+        sched.submit(lat, lon)
+    while sched.busy:
+        time.sleep(0.01)
+    sched.close()
+    return {k: sched.stats[k] for k in ("fixes", "started", "skipped", "coalesced", "cancelled")}
+
+# === REPORT ===
+def _percentiles(xs: List[float]) -> Dict[str, float]:
+    if not xs:
+        return {"n": 0}
+    ms = np.asarray(xs) * 1000.0
+    return {"n": len(xs), "mean_ms": round(float(ms.mean()), 3), "p50_ms": round(float(np.percentile(ms, 50)), 3),
+            "p95_ms": round(float(np.percentile(ms, 95)), 3), "p99_ms": round(float(np.percentile(ms, 99)), 3),
+            "max_ms": round(float(ms.max()), 3)}
+
+def run_replay(track: List[Fix], speed: float = 1.0, driver: str = "scheduler", mode: str = "generate",
+               real: bool = False, model_mb: int = 16, cache: bool = False, rss_interval: float = 0.5,
+               sched_opts: Optional[Dict[str, float]] = None, source: str = "",
+               cascade: Optional[float] = None) -> Dict[str, object]:
+    # cascade: escalation threshold to run with the tiered cascade on
+    workdir = None
+    if real:
+        if str(BACKEND_DIR) not in sys.path:
+            sys.path.insert(0, str(BACKEND_DIR))
+        import main as backend
+    else:
+        workdir = Path(tempfile.mkdtemp(prefix="qrs-replay-"))
+        backend = load_backend(workdir, model_mb)
+        backend.CACHE_ENABLED = cache
+    if cascade is not None:
+        from cascade import Cascade
+        backend.CASCADE_ENABLED = True
+        backend.CASCADE = Cascade(threshold=cascade)
+    if not backend.warm_model():
+        raise SystemExit(f"model not available: {backend.MODEL_MANAGER.last_error or 'MODEL MISSING'}")
+
+    col = _Collector()
+    rss = RssSampler(rss_interval)
+    rss.start()
+    t0 = time.perf_counter()
+    if driver == "threads":
+        counts = drive_threads(backend, track, speed, mode, col)
+    else:
+        counts = drive_scheduler(backend, track, speed, mode, col, sched_opts or {})
+    duration = time.perf_counter() - t0
+    rss.stop()
+    backend.MODEL_MANAGER.unload()
+    if workdir is not None:
+        import model_container
+        close_history()
+        model_container.release_decrypted_models()
+        for p in sorted(workdir.rglob("*"), reverse=True):
+            p.unlink() if p.is_file() else p.rmdir()
+        workdir.rmdir()
+
+    completed = len(col.latencies)
+    return {
+        "meta": {
+            "python": platform.python_version(), "platform": platform.platform(), "timestamp": time.time(),
+            "track": source, "fixes": len(track), "track_s": round(track[-1][0], 3) if track else 0.0,
+            "speed": speed, "driver": driver, "mode": mode, "backend": "real" if real else "stub",
+            "cache": cache if not real else backend.CACHE_ENABLED, "scheduler": sched_opts or {},
+            "cascade": backend.CASCADE.snapshot() if backend.CASCADE is not None else None,
+            "prompt_token_latency": None if real else FakeLlama.prompt_token_latency,
+            "gen_token_latency": None if real else FakeLlama.gen_token_latency,
+        },
+        "latency": _percentiles(col.latencies),
+        "fixes": {**counts, "completed": completed, "cached": col.cached, "errors": col.errors,
+                  "dropped": counts["skipped"] + counts["coalesced"] + counts["cancelled"]},
+        "verdicts": col.verdicts,
+        "tiers": col.tiers,
+        "duration_s": round(duration, 3),
+        "throughput_per_s": round(completed / duration, 3) if duration > 0 else 0.0,
+        "rss_kb": {"peak": max((kb for _, kb in rss.series), default=0), "series": rss.series},
+    }
+
+def compare(base: Dict[str, object], cur: Dict[str, object], threshold: float = 0.2) -> List[Dict[str, object]]:
+    # Latency percentiles that grew, or throughput / completed scans that
+    # shrank, by more than `threshold` (fraction).
+    regressions = []
+    for key in ("p50_ms", "p95_ms", "p99_ms"):
+        old, now = base.get("latency", {}).get(key), cur["latency"].get(key)
+        if old and now and now > old * (1 + threshold):
+            regressions.append({"metric": f"latency.{key}", "base": old, "current": now, "ratio": round(now / old, 3)})
+    for path, old, now in (("throughput_per_s", base.get("throughput_per_s"), cur["throughput_per_s"]),
+                           ("fixes.completed", base.get("fixes", {}).get("completed"), cur["fixes"]["completed"])):
+        if old and now < old * (1 - threshold):
+            regressions.append({"metric": path, "base": old, "current": now, "ratio": round(now / old, 3)})
+    return regressions
+
+def _print_summary(r: Dict[str, object]):
+    m, lat, fx = r["meta"], r["latency"], r["fixes"]
+    print(f"{m['fixes']} fixes over {m['track_s']:.0f}s at {m['speed']}x, driver={m['driver']} backend={m['backend']}")
+    if lat["n"]:
+        print(f"latency ms  p50 {lat['p50_ms']:.1f}  p95 {lat['p95_ms']:.1f}  p99 {lat['p99_ms']:.1f}  "
+              f"max {lat['max_ms']:.1f}")
+    print(f"completed {fx['completed']}  skipped {fx['skipped']}  coalesced {fx['coalesced']}  "
+          f"cancelled {fx['cancelled']}  cached {fx['cached']}  errors {fx['errors']}")
+    print(f"throughput {r['throughput_per_s']:.2f} scans/s over {r['duration_s']:.1f}s  "
+          f"peak RSS {r['rss_kb']['peak']} KiB")
+    if r["tiers"]:
+        print("tiers  " + "  ".join(f"{t} {n}" for t, n in sorted(r["tiers"].items())))
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m bench.replay", description="Replay a GPS track against the scanner")
+    src = ap.add_mutually_exclusive_group(required=True)
+    src.add_argument("track", nargs="?", type=Path, help="CSV, GPX or JSONL track")
+    src.add_argument("--synthetic", type=int, metavar="N", help="generate an N-fix straight drive instead")
+    ap.add_argument("--speed", type=float, default=1.0, help="replay N x faster than recorded")
+    ap.add_argument("--driver", choices=("scheduler", "threads"), default="scheduler")
+    ap.add_argument("--mode", choices=("generate", "classify"), default="generate")
+    ap.add_argument("--real", action="store_true", help="use the real model instead of the stub Llama")
+    ap.add_argument("--cache", action="store_true", help="keep the verdict cache on (stub backend)")
+    ap.add_argument("--model-mb", type=int, default=16, help="size of the stub's synthetic encrypted model")
+    ap.add_argument("--prompt-token-latency", type=float, help="stub: seconds per evaluated prompt token")
+    ap.add_argument("--token-latency", type=float, help="stub: seconds per generated token")
+    ap.add_argument("--min-distance", type=float, help="scheduler: metres between scanned fixes")
+    ap.add_argument("--min-interval", type=float, help="scheduler: seconds between scan starts")
+    ap.add_argument("--refresh", type=float, help="scheduler: rescan a stationary device after this long")
+    ap.add_argument("--cascade", type=float, metavar="THRESHOLD",
+                    help="run the tiered cascade, escalating below this confidence")
+    ap.add_argument("--rss-interval", type=float, default=0.5)
+    ap.add_argument("--save", type=Path, help="write the report as JSON")
+    ap.add_argument("--compare", type=Path, help="compare against a saved report")
+    ap.add_argument("--threshold", type=float, default=0.2)
+    ap.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = ap.parse_args(argv)
+
+    track = synthetic_track(args.synthetic) if args.synthetic else load_track(args.track)
+    if not track:
+        print("empty track", file=sys.stderr)
+        return 2
+    FakeLlama.configure(prompt_token_latency=args.prompt_token_latency, gen_token_latency=args.token_latency)
+    sched_opts = {k: v for k, v in (("min_distance_m", args.min_distance), ("min_interval_s", args.min_interval),
+                                    ("refresh_s", args.refresh)) if v is not None}
+    report = run_replay(track, args.speed, args.driver, args.mode, args.real, args.model_mb, args.cache,
+                        args.rss_interval, sched_opts, str(args.track or f"synthetic:{args.synthetic}"), args.cascade)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        _print_summary(report)
+    if args.save:
+        args.save.write_text(json.dumps(report, indent=2))
+    if args.compare:
+        regressions = compare(json.loads(args.compare.read_text()), report, args.threshold)
+        for r in regressions:
+            print(f"REGRESSION {r['metric']}: {r['base']} -> {r['current']} ({r['ratio']}x)", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,228 @@
+# python-backend/bench/runner.py
+# Times each stage of the scan pipeline, reports p50/p95/p99 and the largest
+# RSS growth seen across the stage (plus the run's peak RSS once), and saves /
+# compares JSON baselines.
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import resource
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .fake_llama import FakeLlama, install_stub_llama_cpp
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+def peak_rss_kb() -> int:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == "darwin" else rss
+
+def current_rss_kb() -> int:
+    # resident pages right now (Linux); falls back to the peak elsewhere
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError, IndexError):
+        return peak_rss_kb()
+
+class StageTimer:
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {}
+        self.rss: Dict[str, int] = {}  # largest RSS growth across one run of the stage
+
+    @contextmanager
+    def stage(self, name: str):
+        rss0 = current_rss_kb()
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.samples.setdefault(name, []).append(time.perf_counter() - t0)
+            self.rss[name] = max(self.rss.get(name, 0), current_rss_kb() - rss0)
+
+    def report(self) -> Dict[str, Dict[str, float]]:
+        out = {}
+        for name, xs in self.samples.items():
+            ms = np.asarray(xs) * 1000.0
+            out[name] = {
+                "n": len(xs),
+                "mean_ms": round(float(ms.mean()), 4),
+                "p50_ms": round(float(np.percentile(ms, 50)), 4),
+                "p95_ms": round(float(np.percentile(ms, 95)), 4),
+                "p99_ms": round(float(np.percentile(ms, 99)), 4),
+                "rss_delta_kb": self.rss.get(name, 0),
+            }
+        return out
+
+def load_backend(workdir: Path, model_mb: int):
+    # Imports python-backend/main.py with its model, key and cache paths
+    # redirected into `workdir` and FakeLlama in place of llama_cpp.Llama.
+    install_stub_llama_cpp()
+    if str(BACKEND_DIR) not in sys.path:
+        sys.path.insert(0, str(BACKEND_DIR))
+    import main as backend
+    from model_container import encrypt_file
+    from prefix_cache import PrefixStateCache
+
+    backend.Llama = FakeLlama
+    backend.MODEL_DIR = workdir
+    backend.MODEL_PATH = workdir / backend.MODEL_FILE
+    backend.ENCRYPTED_MODEL = backend.MODEL_PATH.with_suffix(".aes")
+    backend.KEY_PATH = workdir / ".enc_key"
+    backend.MODEL_MANAGER = backend.ModelManager(backend.MODEL_PATH, idle_timeout=0)
+    backend.PREFIX_CACHE = PrefixStateCache(workdir)
+    backend.CACHE_ENABLED = False  # every scan should reach the model
+    backend.HISTORY_PATH = workdir / "scan_history.db"
+
+    plain = workdir / "plain.gguf"
+    with open(plain, "wb") as f:
+        for _ in range(model_mb):
+            f.write(os.urandom(1 << 20))
+    encrypt_file(plain, backend.ENCRYPTED_MODEL, backend.get_key())
+    plain.unlink()
+    return backend
+
+def close_history():
+    # scans record into the workdir's history store; close it before cleanup
+    mod = sys.modules.get("scan_history")
+    history = mod.get_history() if mod is not None else None
+    if history is not None:
+        history.close()
+
+def run_benchmarks(iterations: int = 50, decrypt_iterations: int = 5, model_mb: int = 16,
+                   seed: int = 7, workdir: Optional[Path] = None) -> Dict[str, object]:
+    random.seed(seed)
+    own_dir = workdir is None
+    workdir = Path(workdir or tempfile.mkdtemp(prefix="qrs-bench-"))
+    backend = load_backend(workdir, model_mb)
+    import model_container
+
+    timer = StageTimer()
+    coords = [(40.7128 + random.uniform(-0.05, 0.05), -74.0060 + random.uniform(-0.05, 0.05))
+              for _ in range(iterations)]
+
+    for _ in range(decrypt_iterations):
+        model_container.release_decrypted_models()
+        with timer.stage("model_decrypt"):
+            model_container.open_decrypted_model(backend.ENCRYPTED_MODEL, backend.get_key())
+
+    with timer.stage("model_load"):
+        backend.decrypt_model()
+        backend.MODEL_MANAGER.warm()
+
+    llm = FakeLlama()
+    for lat, lon in coords:
+        with timer.stage("metrics"):
+            metrics = backend.collect_system_metrics()
+        with timer.stage("quantum_score"):
+            entropy = backend.entropic_summary_text(backend.pennylane_entropic_score(backend.metrics_to_rgb(metrics)))
+        with timer.stage("build_road_scanner_prompt"):
+            prompt = backend.build_road_scanner_prompt(lat, lon, metrics, entropy)
+        with timer.stage("punkd_analyze"):
+            weights = backend.punkd_analyze(prompt, top_n=16)
+        with timer.stage("punkd_apply"):
+            backend.punkd_apply(prompt, weights, profile="aggressive")
+        with timer.stage("chunked_generate"):
+            backend.chunked_generate(llm, prompt, punkd_profile="aggressive")
+        t0 = time.perf_counter()
+        first = None
+        with timer.stage("stream_generate"):
+            for ev in backend.stream_generate(llm, prompt):
+                if first is None:
+                    first = time.perf_counter() - t0
+        timer.samples.setdefault("stream_first_token", []).append(first)
+        with timer.stage("run_quantum_scan"):
+            backend.run_quantum_scan(lat, lon, mode="generate")
+        with timer.stage("run_quantum_scan_classify"):
+            backend.run_quantum_scan(lat, lon, mode="classify")
+
+    model_container.release_decrypted_models()
+    backend.MODEL_MANAGER.unload()
+    close_history()
+    if own_dir:
+        for p in sorted(workdir.rglob("*"), reverse=True):
+            p.unlink() if p.is_file() else p.rmdir()
+        workdir.rmdir()
+
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "iterations": iterations,
+            "decrypt_iterations": decrypt_iterations,
+            "model_mb": model_mb,
+            "prompt_token_latency": FakeLlama.prompt_token_latency,
+            "gen_token_latency": FakeLlama.gen_token_latency,
+            "timestamp": time.time(),
+            "peak_rss_kb": peak_rss_kb(),
+        },
+        "stages": timer.report(),
+    }
+
+def compare(base: Dict[str, object], cur: Dict[str, object], threshold: float = 0.2) -> List[Dict[str, object]]:
+    # Stages whose p50 or p95 grew by more than `threshold` (fraction).
+    regressions = []
+    for name, now in cur["stages"].items():
+        old = base.get("stages", {}).get(name)
+        if not old:
+            continue
+        for key in ("p50_ms", "p95_ms"):
+            if old[key] > 0 and now[key] > old[key] * (1 + threshold):
+                regressions.append({"stage": name, "metric": key, "base": old[key], "current": now[key],
+                                    "ratio": round(now[key] / old[key], 3)})
+    return regressions
+
+def _print_table(report: Dict[str, object], base: Optional[Dict[str, object]] = None):
+    print(f"{'stage':28} {'n':>4} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'+rss KiB':>10}" +
+          ("  p50 vs base" if base else ""))
+    for name, s in report["stages"].items():
+        line = f"{name:28} {s['n']:>4} {s['p50_ms']:>10.3f} {s['p95_ms']:>10.3f} {s['p99_ms']:>10.3f} {s['rss_delta_kb']:>10}"
+        old = (base or {}).get("stages", {}).get(name)
+        if old and old["p50_ms"] > 0:
+            line += f"  {s['p50_ms'] / old['p50_ms']:.2f}x"
+        print(line)
+    print(f"peak RSS {report['meta']['peak_rss_kb']} KiB")
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m bench", description="QRS scan pipeline benchmarks")
+    ap.add_argument("--iterations", type=int, default=50)
+    ap.add_argument("--decrypt-iterations", type=int, default=5)
+    ap.add_argument("--model-mb", type=int, default=16, help="size of the synthetic encrypted model")
+    ap.add_argument("--prompt-token-latency", type=float, help="seconds per evaluated prompt token")
+    ap.add_argument("--token-latency", type=float, help="seconds per generated token")
+    ap.add_argument("--load-latency", type=float, help="seconds per fake model load")
+    ap.add_argument("--script", help="JSON list of scripted completions")
+    ap.add_argument("--save", type=Path, help="write the report as a JSON baseline")
+    ap.add_argument("--compare", type=Path, help="compare against a saved baseline")
+    ap.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown before a stage is flagged")
+    ap.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = ap.parse_args(argv)
+
+    FakeLlama.configure(prompt_token_latency=args.prompt_token_latency, gen_token_latency=args.token_latency,
+                        load_latency=args.load_latency, script=json.loads(args.script) if args.script else None)
+    report = run_benchmarks(args.iterations, args.decrypt_iterations, args.model_mb)
+    base = json.loads(args.compare.read_text()) if args.compare else None
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        _print_table(report, base)
+    if args.save:
+        args.save.write_text(json.dumps(report, indent=2))
+    if base is not None:
+        regressions = compare(base, report, args.threshold)
+        for r in regressions:
+            print(f"REGRESSION {r['stage']} {r['metric']}: {r['base']:.3f} -> {r['current']:.3f} ms ({r['ratio']}x)",
+                  file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
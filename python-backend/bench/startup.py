@@ -0,0 +1,128 @@
+# python-backend/bench/startup.py
+# Cold-start benchmark for the backend entry point: per-module import times
+# from `python -X importtime -c "import main"` and wall time of the READY
+# (no-arg) and `--warm` invocations, each in a fresh interpreter.
+# Run from python-backend/:  python -m bench.startup [--save s.json] [--compare s.json]
+
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+from pathlib import Path
+from typing import Dict, List, Optional
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+_IMPORTTIME = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$")
+
+def _run(args: List[str], env: Optional[Dict[str, str]] = None) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable] + args, cwd=BACKEND_DIR, capture_output=True, text=True,
+                          env={**os.environ, **(env or {})})
+
+def import_times(module: str = "main") -> Dict[str, Dict[str, float]]:
+    # {module: {"self_ms", "cumulative_ms", "depth"}} for every module the
+    # import pulls in. importtime prints children before their parent, so the
+    # rows since the previous top-level entry belong to `module`; site and
+    # interpreter startup are left out.
+    proc = _run(["-X", "importtime", "-c", f"import {module}"])
+    block = {}
+    for line in proc.stderr.splitlines():
+        m = _IMPORTTIME.match(line)
+        if not m:
+            continue
+        self_us, cum_us, indent, name = m.groups()
+        depth = (len(indent) - 1) // 2
+        block[name] = {"self_ms": int(self_us) / 1000.0, "cumulative_ms": int(cum_us) / 1000.0, "depth": depth}
+        if depth == 0:
+            if name == module:
+                return block
+            block = {}
+    raise RuntimeError(f"import {module} failed:\n{proc.stderr.strip()[-2000:]}")
+
+def wall_ms(args: List[str], runs: int) -> Dict[str, float]:
+    xs = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        _run(args)
+        xs.append((time.perf_counter() - t0) * 1000.0)
+    xs.sort()
+    return {"n": runs, "min_ms": round(xs[0], 3), "p50_ms": round(xs[len(xs) // 2], 3), "max_ms": round(xs[-1], 3)}
+
+def run_startup(runs: int = 5, warm: bool = False) -> Dict[str, object]:
+    imports = import_times("main")
+    report = {
+        "meta": {"python": platform.python_version(), "platform": platform.platform(), "runs": runs,
+                 "timestamp": time.time()},
+        "import_main_ms": imports["main"]["cumulative_ms"],
+        "imports": imports,
+        "wall": {"ready": wall_ms(["main.py"], runs)},
+    }
+    if warm:
+        report["wall"]["warm"] = wall_ms(["main.py", "--warm"], runs)
+    return report
+
+def compare(base: Dict[str, object], cur: Dict[str, object], threshold: float = 0.2,
+            floor_ms: float = 2.0) -> List[Dict[str, object]]:
+    # Modules whose cumulative import time grew by more than `threshold` and
+    # by at least `floor_ms`, new direct imports of main costing over
+    # `floor_ms`, and slower wall times.
+    regressions = []
+    old_imports = base.get("imports", {})
+    for name, now in cur["imports"].items():
+        old = old_imports.get(name)
+        if old is None:
+            if now["depth"] == 1 and now["cumulative_ms"] >= floor_ms:
+                regressions.append({"module": name, "metric": "new_import", "base": 0.0,
+                                    "current": now["cumulative_ms"], "ratio": None})
+        elif (now["cumulative_ms"] > old["cumulative_ms"] * (1 + threshold)
+              and now["cumulative_ms"] - old["cumulative_ms"] >= floor_ms):
+            regressions.append({"module": name, "metric": "cumulative_ms", "base": old["cumulative_ms"],
+                                "current": now["cumulative_ms"],
+                                "ratio": round(now["cumulative_ms"] / old["cumulative_ms"], 3)})
+    for name, now in cur["wall"].items():
+        old = base.get("wall", {}).get(name)
+        if old and old["p50_ms"] > 0 and now["p50_ms"] > old["p50_ms"] * (1 + threshold):
+            regressions.append({"module": f"<{name}>", "metric": "p50_ms", "base": old["p50_ms"],
+                                "current": now["p50_ms"], "ratio": round(now["p50_ms"] / old["p50_ms"], 3)})
+    return regressions
+
+def _print_report(report: Dict[str, object], top: int):
+    print(f"import main: {report['import_main_ms']:.1f} ms")
+    for name, w in report["wall"].items():
+        print(f"main.py {name:6} p50 {w['p50_ms']:.1f} ms  (min {w['min_ms']:.1f}, max {w['max_ms']:.1f})")
+    print(f"\n{'module':48} {'self ms':>9} {'cum ms':>9}")
+    rows = sorted(report["imports"].items(), key=lambda kv: kv[1]["cumulative_ms"], reverse=True)
+    for name, t in rows[:top]:
+        print(f"{'  ' * t['depth'] + name:48} {t['self_ms']:>9.2f} {t['cumulative_ms']:>9.2f}")
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m bench.startup", description="QRS backend cold-start benchmark")
+    ap.add_argument("--runs", type=int, default=5, help="fresh interpreters per wall-time measurement")
+    ap.add_argument("--warm", action="store_true", help="also time `main.py --warm`")
+    ap.add_argument("--top", type=int, default=25, help="slowest modules to list")
+    ap.add_argument("--save", type=Path, help="write the report as a JSON baseline")
+    ap.add_argument("--compare", type=Path, help="compare against a saved baseline")
+    ap.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown before a module is flagged")
+    ap.add_argument("--floor-ms", type=float, default=2.0, help="ignore import changes smaller than this")
+    ap.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = ap.parse_args(argv)
+
+    report = run_startup(args.runs, args.warm)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        _print_report(report, args.top)
+    if args.save:
+        args.save.write_text(json.dumps(report, indent=2))
+    if args.compare:
+        regressions = compare(json.loads(args.compare.read_text()), report, args.threshold, args.floor_ms)
+        for r in regressions:
+            print(f"REGRESSION {r['module']} {r['metric']}: {r['base']:.2f} -> {r['current']:.2f} ms", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
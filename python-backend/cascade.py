@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# python-backend/cascade.py
+# Tiered scans. The heuristic tier scores the scene from the numbers the
+# prompt carries (system metrics and the entropic score; the scene text has
+# no road-condition words for PUNKD to weigh) and answers on its own when its
+# confidence reaches `threshold`;
+# an optional tiny GGUF (QRS_CASCADE_MODEL, see main.py) is tried next, and
+# only what is still uncertain goes to the full model. Every answer carries
+# "tier" and "confidence". A QRS_CASCADE_AUDIT share of fast answers is also
+# re-run on the full model to measure how often the tiers agree with it.
+
+import os
+import math
+import random
+import threading
+from typing import Dict, Tuple
+
+from token_stream import RISK_LABELS
+
+THRESHOLD = float(os.environ.get("QRS_CASCADE_THRESHOLD", "0.8"))  # escalate below this confidence
+AUDIT = float(os.environ.get("QRS_CASCADE_AUDIT", "0"))            # share of fast answers re-checked
+TIERS = ("heuristic", "small", "full")
+
+# risk in [0, 1] from the metrics and the entropic score; bands match
+# entropic_summary_text (STABLE < 0.55 <= TURBULENT < 0.78 <= CHAOS)
+WEIGHTS = {"score": 0.45, "cpu": 0.1, "mem": 0.1, "load1": 0.1, "temp": 0.15, "proc": 0.1}
+BANDS = {"Low": (0.0, 0.55), "Medium": (0.55, 0.78), "High": (0.78, 1.0)}
+TAU = 0.05  # softness of the band edges
+
+def scene_risk(metrics: Dict[str, float], score: float) -> float:
+    risk = WEIGHTS["score"] * score
+    risk += sum(w * min(1.0, max(0.0, float(metrics.get(k, 0.0)))) for k, w in WEIGHTS.items() if k != "score")
+    return min(1.0, max(0.0, risk))
+
+def label_probabilities(risk: float) -> Dict[str, float]:
+    # exp(-distance to each band / TAU), normalized: near 1 deep inside a
+    # band, about 0.5 on an edge.
+    dist = {label: max(lo - risk, risk - hi, 0.0) for label, (lo, hi) in BANDS.items()}
+    w = {label: math.exp(-d / TAU) for label, d in dist.items()}
+    total = sum(w.values())
+    return {label: w[label] / total for label in RISK_LABELS}
+
+def heuristic_verdict(metrics: Dict[str, float], score: float) -> Tuple[str, float, Dict[str, float]]:
+    probs = label_probabilities(scene_risk(metrics, score))
+    verdict = max(probs, key=probs.get)
+    return verdict, probs[verdict], probs
+
+class Cascade:
+    def __init__(self, threshold: float = THRESHOLD, audit: float = AUDIT):
+        self.threshold = threshold
+        self.audit = audit
+        self.stats = {t: 0 for t in TIERS}  # answers per tier
+        self.agreement = {t: [0, 0] for t in TIERS[:-1]}  # tier -> [agreed, audited]
+        self._lock = threading.Lock()
+
+    def accept(self, confidence: float) -> bool:
+        return confidence >= self.threshold
+
+    def answered(self, tier: str):
+        with self._lock:
+            self.stats[tier] += 1
+
+    def should_audit(self, tier: str) -> bool:
+        return tier != "full" and self.audit > 0 and random.random() < self.audit
+
+    def audited(self, tier: str, verdict: str, full_verdict: str):
+        with self._lock:
+            self.agreement[tier][0] += verdict == full_verdict
+            self.agreement[tier][1] += 1
+
+    def snapshot(self) -> Dict[str, object]:
+        with self._lock:
+            return {"threshold": self.threshold, **self.stats,
+                    "audited": {t: n for t, (_, n) in self.agreement.items()},
+                    "agreement": {t: round(a / n, 3) if n else None for t, (a, n) in self.agreement.items()}}
+
+if __name__ == "__main__":
+    import json
+    import sys
+    # cascade.py SCORE [cpu mem load1 temp proc]
+    if len(sys.argv) < 2:
+        print("usage: cascade.py SCORE [CPU MEM LOAD1 TEMP PROC]", file=sys.stderr)
+        sys.exit(2)
+    vals = [float(v) for v in sys.argv[2:7]]
+    metrics = dict(zip(("cpu", "mem", "load1", "temp", "proc"), vals))
+    verdict, confidence, probs = heuristic_verdict(metrics, float(sys.argv[1]))
+    print(json.dumps({"verdict": verdict, "confidence": round(confidence, 3), "probabilities": probs,
+                      "escalate": confidence < THRESHOLD}))
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+# python-backend/embedded_worker.py
+# Persistent scan worker for the app's embedded Python 3.14. The interpreter
+# is started once and runs serve() for the life of the app: it imports the
+# backend once, keeps the model resident (main.MODEL_MANAGER) and takes
+# requests over a pipe as JSON lines, so no source is generated per scan.
+#
+#   request : {"id": 1, "op": "scan", "lat": .., "lon": .., "model": PATH, "fingerprint": HEX}
+#             {"id": 2, "op": "warm", "model": PATH}
+#             {"id": 1, "op": "cancel"}   {"op": "shutdown"}
+#   events  : {"ready": true, "python": "3.14.0", "pid": N}          once, at start
+#             {"id": 1, "token": "...", "token_id": N}               while decoding
+#             {"id": 1, "done": true, "verdict": "High", ...}        last event of a request
+#
+# "model" is the host's decrypted mapping (/proc/<pid>/fd/N), so the worker
+# never decrypts on its own. `python embedded_worker.py` speaks the same
+# protocol on stdin/stdout.
+
+import os
+import sys
+import json
+import queue
+import ctypes
+import itertools
+import threading
+from pathlib import Path
+from typing import Callable, Dict, IO, Iterator, Optional, Tuple
+
+BACKEND_DIR = Path(__file__).parent
+POLL_S = 0.1  # how often a waiting scan checks should_stop
+WARM_TIMEOUT_S = 600.0  # longest a warm-up (model load) may take
+
+# === WORKER SIDE (runs inside the embedded interpreter) ===
+def serve(rfd: int, wfd: int):
+    out = os.fdopen(wfd, "w", buffering=1)
+    lock = threading.Lock()
+
+    def send(msg: Dict[str, object]):
+        with lock:
+            out.write(json.dumps(msg) + "\n")
+            out.flush()
+
+    import main as backend
+    send({"ready": True, "python": sys.version.split()[0], "pid": os.getpid()})
+    jobs: "queue.Queue[Optional[Dict[str, object]]]" = queue.Queue()
+    cancelled = set()
+
+    def read():
+        # requests are read on their own thread so a cancel reaches a running scan
+        with os.fdopen(rfd, "r") as inp:
+            for line in inp:
+                try:
+                    req = json.loads(line)
+                except ValueError:
+                    continue
+                op = req.get("op")
+                if op == "cancel":
+                    cancelled.add(req.get("id"))
+                elif op == "shutdown":
+                    break
+                else:
+                    jobs.put(req)
+        jobs.put(None)
+
+    threading.Thread(target=read, name="qrs-worker-read", daemon=True).start()
+    attached = None
+    while True:
+        req = jobs.get()
+        if req is None:
+            break
+        rid, op = req.get("id"), req.get("op")
+        try:
+            if req.get("model") and req["model"] != attached:
+                fp = req.get("fingerprint")
+                backend.attach_shared_model(Path(req["model"]), bytes.fromhex(fp) if fp else None)
+                attached = req["model"]
+            if op == "warm":
+                ok = backend.warm_model()
+                send({"id": rid, "done": True, "ok": ok, "model": backend.MODEL_MANAGER.profile,
+                      "error": backend.MODEL_MANAGER.last_error})
+            elif op == "scan":
+                for ev in backend.iter_quantum_scan(float(req["lat"]), float(req["lon"]),
+                                                    should_stop=lambda: rid in cancelled):
+                    if "verdict" in ev:
+                        send({**ev, "id": rid, "done": True})
+                    else:
+                        send({"id": rid, "token": ev["token"], "token_id": ev.get("id")})
+            else:
+                send({"id": rid, "done": True, "verdict": "ERROR", "entropy": f"unknown op {op!r}"})
+        except Exception as e:
+            send({"id": rid, "done": True, "verdict": "ERROR", "entropy": str(e)})
+        finally:
+            cancelled.discard(rid)
+    out.close()
+
+# === HOST SIDE ===
+class WorkerClient:
+    # Talks to serve() over a pair of text streams. One reader thread routes
+    # events to the request they belong to, so scans and warm-ups may be
+    # issued from any thread.
+    def __init__(self, events: IO[str], requests: IO[str]):
+        self._events = events
+        self._requests = requests
+        self._ids = itertools.count(1)
+        self._pending: Dict[int, "queue.Queue[Dict[str, object]]"] = {}
+        self._lock = threading.Lock()
+        self.info: Dict[str, object] = {}
+        self.ready = threading.Event()
+        self.alive = True
+        threading.Thread(target=self._read, name="qrs-worker-events", daemon=True).start()
+
+    def _read(self):
+        for line in self._events:
+            try:
+                ev = json.loads(line)
+            except ValueError:
+                continue
+            if "id" not in ev:
+                self.info = ev
+                self.ready.set()
+                continue
+            with self._lock:
+                q = self._pending.get(ev["id"])
+            if q is not None:
+                q.put(ev)
+        # under the lock: a request either registered before this (and gets
+        # the message) or sees alive False
+        with self._lock:
+            self.alive = False
+            for q in self._pending.values():
+                q.put({"done": True, "verdict": "ERROR", "entropy": "worker exited"})
+        self.ready.set()
+
+    def _send(self, msg: Dict[str, object]):
+        with self._lock:
+            self._requests.write(json.dumps(msg) + "\n")
+            self._requests.flush()
+
+    def _request(self, op: str, **args) -> Tuple[int, "queue.Queue[Dict[str, object]]"]:
+        q: "queue.Queue[Dict[str, object]]" = queue.Queue()
+        with self._lock:
+            if not self.alive:
+                raise RuntimeError("worker exited")
+            rid = next(self._ids)
+            self._pending[rid] = q
+        try:
+            self._send({"id": rid, "op": op, **args})
+        except OSError:
+            self._forget(rid)
+            raise
+        return rid, q
+
+    def _forget(self, rid: int):
+        with self._lock:
+            self._pending.pop(rid, None)
+
+    def warm(self, model: Optional[Path] = None, fingerprint: Optional[bytes] = None,
+             timeout: Optional[float] = WARM_TIMEOUT_S) -> Dict[str, object]:
+        rid, q = self._request("warm", **_model_args(model, fingerprint))
+        try:
+            return q.get(timeout=timeout)
+        except queue.Empty:
+            return {"done": True, "ok": False, "error": f"warm-up timed out after {timeout:.0f}s"}
+        finally:
+            self._forget(rid)
+
+    def scan(self, lat: float, lon: float, model: Optional[Path] = None, fingerprint: Optional[bytes] = None,
+             should_stop: Optional[Callable[[], bool]] = None) -> Iterator[Dict[str, object]]:
+        # Yields {"token": ...} events, then the final {"done": True, "verdict", ...}.
+        rid, q = self._request("scan", lat=lat, lon=lon, **_model_args(model, fingerprint))
+        cancelled = False
+        try:
+            while True:
+                try:
+                    ev = q.get(timeout=POLL_S)
+                except queue.Empty:
+                    ev = None
+                if not cancelled and should_stop is not None and should_stop():
+                    self._send({"op": "cancel", "id": rid})
+                    cancelled = True
+                if ev is None:
+                    continue
+                ev.pop("id", None)
+                yield ev
+                if ev.get("done"):
+                    return
+        finally:
+            self._forget(rid)
+
+    def close(self):
+        if self.alive:
+            try:
+                self._send({"op": "shutdown"})
+            except OSError:
+                pass
+        self._requests.close()
+
+def _model_args(model: Optional[Path], fingerprint: Optional[bytes]) -> Dict[str, object]:
+    args = {}
+    if model is not None:
+        args["model"] = os.path.abspath(str(model))  # not resolve(): that would follow the memfd link
+    if fingerprint:
+        args["fingerprint"] = fingerprint.hex()
+    return args
+
+class EmbeddedInterpreter:
+    # libpython loaded with ctypes. The host thread that initializes it gives
+    # up its GIL right away so run() can enter from any thread.
+    def __init__(self, lib_path: Path, stdlib: Optional[Path] = None):
+        self.lib = ctypes.CDLL(str(lib_path))
+        self.lib.PyGILState_Ensure.restype = ctypes.c_int
+        self.lib.PyGILState_Release.argtypes = [ctypes.c_int]
+        self.lib.PyEval_SaveThread.restype = ctypes.c_void_p
+        self.lib.Py_InitializeEx(0)  # signal handlers stay with the host
+        if stdlib is not None:
+            self.lib.PyRun_SimpleString(f"import sys; sys.path.insert(0, {str(stdlib)!r})".encode())
+        self.lib.PyEval_SaveThread()
+
+    def run(self, code: str) -> int:
+        state = self.lib.PyGILState_Ensure()
+        try:
+            return self.lib.PyRun_SimpleString(code.encode())
+        finally:
+            self.lib.PyGILState_Release(state)
+
+def start_embedded_worker(lib_path: Path, stdlib: Optional[Path] = None) -> WorkerClient:
+    # Boots the interpreter and runs serve() on a daemon thread; the only
+    # source it ever executes is this fixed bootstrap.
+    interp = EmbeddedInterpreter(lib_path, stdlib)
+    req_r, req_w = os.pipe()
+    ev_r, ev_w = os.pipe()
+    boot = (f"import sys; sys.path.insert(0, {str(BACKEND_DIR)!r}); "
+            f"import embedded_worker; embedded_worker.serve({req_r}, {ev_w})")
+    threading.Thread(target=interp.run, args=(boot,), name="qrs-py314", daemon=True).start()
+    return WorkerClient(os.fdopen(ev_r, "r"), os.fdopen(req_w, "w", buffering=1))
+
+if __name__ == "__main__":
+    # protocol on stdin/stdout; anything else printing to fd 1 goes to stderr
+    wfd = os.dup(1)
+    os.dup2(2, 1)
+    serve(sys.stdin.fileno(), wfd)
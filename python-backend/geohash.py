@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# python-backend/geohash.py
+# Geohash cells and great-circle distance, shared by the scan history, the
+# verdict cache and the scan scheduler. Stdlib only.
+
+import math
+from typing import Set, Tuple
+
+CELL_PRECISION = 6          # ~1.2 km x 0.6 km cells
+EARTH_RADIUS_M = 6371000.0
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+def geohash_encode(lat: float, lon: float, precision: int = CELL_PRECISION) -> str:
+    lat_rng, lon_rng = [-90.0, 90.0], [-180.0, 180.0]
+    out, bits, ch, even = [], 0, 0, True
+    while len(out) < precision:
+        rng, val = (lon_rng, lon) if even else (lat_rng, lat)
+        mid = (rng[0] + rng[1]) / 2
+        if val >= mid:
+            ch = (ch << 1) | 1
+            rng[0] = mid
+        else:
+            ch <<= 1
+            rng[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            out.append(_BASE32[ch])
+            bits = ch = 0
+    return "".join(out)
+
+def cell_size_deg(precision: int = CELL_PRECISION) -> Tuple[float, float]:
+    lon_bits = (5 * precision + 1) // 2
+    lat_bits = 5 * precision // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lon_bits)
+
+def _covering(lat: float, lon: float, radius_m: float, precision: int) -> Tuple[range, range, int]:
+    # Row and column indices of the cells under the circle's bounding box
+    # (columns taken modulo the returned count). A box that reaches a pole
+    # spans every longitude, so its columns are capped at the full band.
+    dlat_cell, dlon_cell = cell_size_deg(precision)
+    n_lat, n_lon = int(round(180.0 / dlat_cell)), int(round(360.0 / dlon_cell))
+    dlat = math.degrees(radius_m / EARTH_RADIUS_M)
+    lat_lo, lat_hi = max(-90.0, lat - dlat), min(90.0, lat + dlat)
+    rows = range(int((lat_lo + 90.0) // dlat_cell), min(n_lat - 1, int((lat_hi + 90.0) // dlat_cell)) + 1)
+    cos_edge = math.cos(math.radians(max(abs(lat_lo), abs(lat_hi))))
+    if cos_edge <= 0 or dlat / cos_edge >= 180.0:
+        return rows, range(n_lon), n_lon
+    dlon = dlat / cos_edge
+    first = int((lon - dlon + 180.0) // dlon_cell)
+    last = int((lon + dlon + 180.0) // dlon_cell)
+    return rows, range(first, min(last, first + n_lon - 1) + 1), n_lon
+
+def covering_size(lat: float, lon: float, radius_m: float, precision: int = CELL_PRECISION) -> int:
+    # How many cells cells_covering() would list, without listing them.
+    rows, cols, _ = _covering(lat, lon, radius_m, precision)
+    return len(rows) * len(cols)
+
+def cells_covering(lat: float, lon: float, radius_m: float, precision: int = CELL_PRECISION) -> Set[str]:
+    # Every geohash cell touched by the bounding box of the circle. Near a
+    # pole that is a whole latitude band; check covering_size() first.
+    dlat_cell, dlon_cell = cell_size_deg(precision)
+    rows, cols, n_lon = _covering(lat, lon, radius_m, precision)
+    return {geohash_encode(-90.0 + (i + 0.5) * dlat_cell, -180.0 + (j % n_lon + 0.5) * dlon_cell, precision)
+            for i in rows for j in cols}
+
+def haversine_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    a = math.sin((p2 - p1) / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
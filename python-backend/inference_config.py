@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# python-backend/inference_config.py
+# Picks llama.cpp threading and batch settings for the machine instead of a
+# fixed n_threads=4. Generation is memory-bound and slows down once threads
+# outnumber the fast physical cores, so n_threads follows the performance
+# cores (big cores on big.LITTLE phones) minus what other work is using;
+# prompt evaluation is compute-bound and gets every core of the worker's
+# share. QRS_N_THREADS / QRS_N_THREADS_BATCH / QRS_N_BATCH override.
+
+import os
+from pathlib import Path
+from typing import Dict, Optional
+
+try:
+    import psutil
+except:
+    psutil = None
+
+CPU_ROOT = Path("/sys/devices/system/cpu")
+# cores below this fraction of the fastest core's capacity count as LITTLE
+BIG_CORE_RATIO = 0.5
+
+def _env_int(name: str) -> Optional[int]:
+    v = os.environ.get(name)
+    return int(v) if v else None
+
+def logical_cores() -> int:
+    return os.cpu_count() or 1
+
+def physical_cores() -> int:
+    if psutil is not None:
+        n = psutil.cpu_count(logical=False)
+        if n:
+            return n
+    try:
+        cores, phys = set(), "0"
+        for line in Path("/proc/cpuinfo").read_text().splitlines():
+            key, _, val = line.partition(":")
+            key = key.strip()
+            if key == "physical id":
+                phys = val.strip()
+            elif key == "core id":
+                cores.add((phys, val.strip()))
+        if cores:
+            return len(cores)
+    except OSError:
+        pass
+    return logical_cores()
+
+def performance_cores() -> int:
+    # Cores within BIG_CORE_RATIO of the fastest one, from the kernel's
+    # cpu_capacity; every core when the capacities are not exposed.
+    caps = []
+    for p in CPU_ROOT.glob("cpu[0-9]*/cpu_capacity"):
+        try:
+            caps.append(int(p.read_text()))
+        except (OSError, ValueError):
+            pass
+    if len(caps) < 2 or max(caps) <= 0:
+        return physical_cores()
+    big = sum(1 for c in caps if c >= max(caps) * BIG_CORE_RATIO)
+    return max(1, min(big, physical_cores()))
+
+def busy_cores() -> float:
+    # Cores' worth of work already running (1-minute load average).
+    try:
+        load1 = psutil.getloadavg()[0] if psutil is not None else os.getloadavg()[0]
+    except (OSError, AttributeError):
+        return 0.0
+    return max(0.0, load1)
+
+def inference_params(workers: int = 1, busy: Optional[float] = None) -> Dict[str, int]:
+    # llama_cpp.Llama kwargs for one of `workers` model instances sharing the
+    # machine. `busy` defaults to the current load average.
+    workers = max(1, workers)
+    cores = performance_cores()
+    share = max(1, cores // workers)
+    busy = busy_cores() if busy is None else busy
+    free = max(1, int(round(cores - busy)))
+    n_threads = max(1, min(share, free // workers or 1))
+    n_threads_batch = max(n_threads, max(1, physical_cores() // workers))
+    n_batch = 512 if n_threads_batch >= 8 else 256 if n_threads_batch >= 4 else 128
+    return {
+        "n_threads": _env_int("QRS_N_THREADS") or n_threads,
+        "n_threads_batch": _env_int("QRS_N_THREADS_BATCH") or n_threads_batch,
+        "n_batch": _env_int("QRS_N_BATCH") or n_batch,
+    }
+
+if __name__ == "__main__":
+    import json
+    import sys
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 1
+    print(json.dumps({"logical": logical_cores(), "physical": physical_cores(), "performance": performance_cores(),
+                      "busy": round(busy_cores(), 2), "workers": workers, **inference_params(workers)}))
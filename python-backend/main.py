@@ -3,34 +3,48 @@
 # Runs in embedded Python 3.14 via WASM on Android
 # Called from React Native via WasmRuntime.call('run_quantum_scan', {lat, lon})
 
+from __future__ import annotations
+
 import os
 import time
 import json
-import hashlib
-import asyncio
+import atexit
 import threading
-import math
-import random
-import re
+import importlib
+import sys
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Dict, Tuple, Optional
-
-# === CRYPTOGRAPHY & MODEL ===
-from cryptography.hazmat.primitives.ciphers.aead import AESGCM
-
-# === LLM & QUANTUM ===
-from llama_cpp import Llama
-
-try:
-    import psutil
-except:
-    psutil = None
-
-try:
-    import pennylane as qml
-    from pennylane import numpy as pnp
-except:
-    qml = pnp = None
+from typing import TYPE_CHECKING, Callable, Dict, Tuple, Optional, List, Iterable, Iterator, Union
+
+import punkd
+from token_stream import RISK_LABELS, continuation_prompt, label_first_tokens, stream_generate
+from scan_trace import current_trace, tracing, log_trace, TRACE_LOG
+
+if TYPE_CHECKING:
+    from llama_cpp import Llama
+
+# === LAZY DEPENDENCIES ===
+# llama_cpp, cryptography, numpy, psutil and the modules built on them load on
+# first use, so the READY / health path only pays for the stdlib. preload()
+# pulls them in on a background thread.
+HEAVY_MODULES = ("numpy", "cryptography.hazmat.primitives.ciphers.aead", "psutil", "llama_cpp",
+                 "inference_config", "memory_profile", "model_container", "prefix_cache", "quantum_engine",
+                 "metrics_sampler")
+Llama = None  # llama_cpp.Llama once loaded; the bench assigns a stand-in here
+PREFIX_CACHE = None
+
+def _llama_cls():
+    global Llama
+    if Llama is None:
+        from llama_cpp import Llama
+    return Llama
+
+def _prefix_cache():
+    global PREFIX_CACHE
+    if PREFIX_CACHE is None:
+        from prefix_cache import PrefixStateCache
+        PREFIX_CACHE = PrefixStateCache(MODEL_DIR)
+    return PREFIX_CACHE
 
 # === PATHS ===
 BASE_DIR = Path(__file__).parent
@@ -40,37 +54,203 @@ MODEL_PATH = MODEL_DIR / MODEL_FILE
 ENCRYPTED_MODEL = MODEL_PATH.with_suffix(".aes")
 KEY_PATH = BASE_DIR / ".enc_key"
 
-MODEL_DIR.mkdir(parents=True, exist_ok=True)
-
 # === ENCRYPTION ===
 def get_key() -> bytes:
     if not KEY_PATH.exists():
+        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
         KEY_PATH.write_bytes(AESGCM.generate_key(256))
     return KEY_PATH.read_bytes()[:32]
 
-def decrypt_model():
-    if ENCRYPTED_MODEL.exists() and not MODEL_PATH.exists():
-        key = get_key()
-        data = ENCRYPTED_MODEL.read_bytes()
-        plain = AESGCM(key).decrypt(data[:12], data[12:], None)
-        MODEL_PATH.write_bytes(plain)
+# (path, fingerprint) of a model another process already decrypted; set in
+# worker_pool workers so they all map the parent's copy.
+SHARED_MODEL: Optional[Tuple[Path, bytes]] = None
+
+def attach_shared_model(path: Path, fingerprint: Optional[bytes]):
+    global SHARED_MODEL
+    SHARED_MODEL = (Path(path), fingerprint)
+
+def decrypt_model() -> Optional[Path]:
+    # Streams the segmented container into an anonymous mapping (see
+    # model_container.py) and points the model manager at it. Legacy single-blob
+    # .aes files are converted in place first. A plaintext MODEL_PATH is only
+    # used when it is already there or no anonymous memory is available.
+    if SHARED_MODEL is not None:
+        MODEL_MANAGER.model_path, MODEL_MANAGER.fingerprint = SHARED_MODEL
+        return SHARED_MODEL[0]
+    from model_container import is_container, convert_legacy, open_decrypted_model, model_fingerprint
+    trace = current_trace()
+    if ENCRYPTED_MODEL.exists():
+        with trace.stage("key_load"):
+            key = get_key()
+        with trace.stage("decrypt"):
+            if not is_container(ENCRYPTED_MODEL):
+                convert_legacy(ENCRYPTED_MODEL, ENCRYPTED_MODEL, key)
+            path = open_decrypted_model(ENCRYPTED_MODEL, key, fallback=MODEL_PATH)
+    elif MODEL_PATH.exists():
+        path = MODEL_PATH
+    else:
+        return None
+    MODEL_MANAGER.model_path = path
+    MODEL_MANAGER.fingerprint = model_fingerprint(ENCRYPTED_MODEL if ENCRYPTED_MODEL.exists() else MODEL_PATH)
+    return path
+
+# === MODEL MANAGER ===
+MODEL_IDLE_TIMEOUT = float(os.environ.get("QRS_MODEL_IDLE_TIMEOUT", "300"))
+
+class ModelManager:
+    # Keeps one Llama resident between scans. Loading the GGUF costs more than
+    # a scan on device, so the instance is shared behind a lock, dropped after
+    # `idle_timeout` seconds without use and reloaded if the file changes.
+    # Load settings come from memory_profile at load time: context sized to
+    # the scan prompt, threads split `workers` ways, stepped down (or refused)
+    # to fit available memory. Explicit kwargs win.
+    def __init__(self, model_path: Path, idle_timeout: float = MODEL_IDLE_TIMEOUT, workers: int = 1, **llama_kwargs):
+        self.model_path = Path(model_path)
+        self.idle_timeout = idle_timeout
+        self.workers = workers
+        self.llama_kwargs = llama_kwargs
+        self.load_params: Dict[str, object] = {}
+        self.profile: Dict[str, object] = {}
+        self.last_error: Optional[str] = None
+        self._prompt_tokens: Dict[Tuple[int, int, int], int] = {}
+        self.loads = 0
+        self.fingerprint: Optional[bytes] = None
+        self._lock = threading.RLock()
+        self._llm: Optional[Llama] = None
+        self._stamp: Optional[Tuple[int, int, int]] = None
+        self._last_used = 0.0
+        self._idle_timer: Optional[threading.Timer] = None
+
+    def _file_stamp(self) -> Tuple[int, int, int]:
+        st = self.model_path.stat()
+        return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+    def _ensure_loaded(self) -> Llama:
+        if not self.model_path.exists():
+            self._unload()
+            raise FileNotFoundError(str(self.model_path))
+        stamp = self._file_stamp()
+        if self._llm is not None and stamp != self._stamp:
+            self._unload()
+        if self._llm is None:
+            from memory_profile import plan_load
+            self.load_params, self.profile = plan_load(self.model_path, self._count_prompt_tokens(stamp),
+                                                       self.workers, self.llama_kwargs)
+            with current_trace().stage("model_load"):
+                self._llm = _llama_cls()(model_path=str(self.model_path), **self.load_params)
+            self._stamp = stamp
+            self.loads += 1
+        return self._llm
+
+    def _count_prompt_tokens(self, stamp: Tuple[int, int, int]) -> int:
+        # Token length of the widest scan prompt, measured once per model file.
+        if stamp not in self._prompt_tokens:
+            from memory_profile import count_prompt_tokens
+            prompt = sizing_prompt()
+            try:
+                self._prompt_tokens[stamp] = count_prompt_tokens(_llama_cls(), self.model_path, prompt)
+            except Exception:
+                self._prompt_tokens[stamp] = len(prompt.encode("utf-8")) // 2  # conservative bytes/token
+        return self._prompt_tokens[stamp]
+
+    def _unload(self):
+        if self._idle_timer is not None:
+            self._idle_timer.cancel()
+            self._idle_timer = None
+        llm, self._llm, self._stamp = self._llm, None, None
+        del llm
 
-# === SYSTEM METRICS ===
-def collect_system_metrics() -> Dict[str, float]:
-    c = m = None
-    if psutil:
+    def _arm_idle_timer(self):
+        if self._idle_timer is not None:
+            self._idle_timer.cancel()
+        if self.idle_timeout <= 0:
+            return
+        self._idle_timer = threading.Timer(self.idle_timeout, self._idle_check)
+        self._idle_timer.daemon = True
+        self._idle_timer.start()
+
+    def _idle_check(self):
+        with self._lock:
+            if self._llm is not None and time.monotonic() - self._last_used >= self.idle_timeout:
+                self._unload()
+
+    @property
+    def loaded(self) -> bool:
+        return self._llm is not None
+
+    def warm(self) -> bool:
+        with self._lock:
+            try:
+                self._ensure_loaded()
+            except (FileNotFoundError, MemoryError) as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                return False
+            self.last_error = None
+            self._last_used = time.monotonic()
+            self._arm_idle_timer()
+            return True
+
+    def reload(self) -> bool:
+        with self._lock:
+            self._unload()
+            return self.warm()
+
+    def unload(self):
+        with self._lock:
+            self._unload()
+
+    @contextmanager
+    def acquire(self):
+        with current_trace().stage("model_acquire"):
+            self._lock.acquire()
         try:
-            c = psutil.cpu_percent(0.1) / 100
-            m = psutil.virtual_memory().percent / 100
-        except:
-            pass
-    return {
-        "cpu": float(c or 0.3),
-        "mem": float(m or 0.4),
-        "load1": 0.2,
-        "temp": 0.5,
-        "proc": 0.1
-    }
+            llm = self._ensure_loaded()
+            try:
+                yield llm
+            finally:
+                self._last_used = time.monotonic()
+                self._arm_idle_timer()
+        finally:
+            self._lock.release()
+
+MODEL_MANAGER = ModelManager(MODEL_PATH)
+
+def warm_model() -> bool:
+    from metrics_sampler import SAMPLER
+    SAMPLER.start()
+    if decrypt_model() is None or not MODEL_MANAGER.warm():
+        return False
+    with MODEL_MANAGER.acquire() as llm:
+        prime_prompt_prefix(llm)
+    return True
+
+def preload(warm: bool = True) -> threading.Thread:
+    # Imports the heavy modules (and optionally warms the model) on a daemon
+    # thread so the caller can answer READY first; join() the thread to wait.
+    def run():
+        for name in HEAVY_MODULES:
+            try:
+                importlib.import_module(name)
+            except ImportError:
+                pass
+        if warm:
+            warm_model()
+    t = threading.Thread(target=run, name="qrs-preload", daemon=True)
+    t.start()
+    return t
+
+def prime_prompt_prefix(llm: Llama) -> int:
+    cache = _prefix_cache()
+    cache.key = get_key()
+    with current_trace().stage("prefix_prime") as rec:
+        primed = cache.prime(llm, ROAD_PROMPT_PREFIX, MODEL_MANAGER.fingerprint)
+        rec["tokens_in"] = primed
+    return primed
+
+# === SYSTEM METRICS ===
+def collect_system_metrics(window: Optional[float] = None) -> Dict[str, float]:
+    from metrics_sampler import collect_system_metrics as sample
+    return sample(window)
 
 def metrics_to_rgb(m: dict) -> Tuple[float, float, float]:
     r = m["cpu"] * 2.2
@@ -79,23 +259,14 @@ def metrics_to_rgb(m: dict) -> Tuple[float, float, float]:
     mx = max(r, g, b, 1.0)
     return (r/mx, g/mx, b/mx)
 
-def pennylane_entropic_score(rgb: Tuple[float, float, float], shots: int = 256) -> float:
-    if qml is None:
-        return sum(rgb)/3 + random.random()*0.15 - 0.075
-    dev = qml.device("default.qubit", wires=2, shots=shots)
-    @qml.qnode(dev)
-    def circuit(a, b, c):
-        qml.RX(a*math.pi, wires=0)
-        qml.RY(b*math.pi, wires=1)
-        qml.CNOT(wires=[0,1])
-        qml.RZ(c*math.pi, wires=1)
-        qml.RX((a+b+c)*math.pi/3, wires=0)
-        return qml.expval(qml.PauliZ(0)), qml.expval(qml.PauliZ(1))
+def pennylane_entropic_score(rgb: Tuple[float, float, float], shots: Optional[int] = None,
+                             backend: str = "numpy") -> float:
+    # Exact expectations from the NumPy statevector engine by default; pass
+    # shots for sampled estimates or backend="pennylane" to cross-check.
     try:
-        e0, e1 = circuit(*rgb)
-        s = 1.0 / (1.0 + math.exp(-9.0 * (((e0+1)/2*0.65 + (e1+1)/2*0.35) - 0.5)))
-        return float(s)
-    except:
+        from quantum_engine import entropic_score
+        return entropic_score(rgb, shots=shots, backend=backend)
+    except Exception:
         return 0.5
 
 def entropic_summary_text(score: float) -> str:
@@ -104,40 +275,46 @@ def entropic_summary_text(score: float) -> str:
     return f"STABLE MANIFOLD {score:.3f}"
 
 # === PUNKD SYSTEM ===
+# The engine lives in punkd.py; a scan prompt's static ROAD_PROMPT_PREFIX is
+# counted once there, so only its scene lines are tokenized per call.
 def punkd_analyze(text: str, top_n: int = 16) -> Dict[str, float]:
-    toks = re.findall(r"[a-zA-Z0-9_]+", text.lower())
-    freq = {}
-    for t in toks: freq[t] = freq.get(t, 0) + 1
-    boost = {"ice":2.8,"wet":2.5,"snow":2.9,"fog":2.3,"flood":3.0,"construction":2.2,"debris":2.4,"animal":2.1,"blackice":4.0,"hydroplane":3.5}
-    scored = {t: c*boost.get(t, 1.0) for t,c in freq.items()}
-    top = sorted(scored.items(), key=lambda x: -x[1])[:top_n]
-    if not top: return {}
-    mx = top[0][1]
-    return {k: float(v/mx) for k,v in top}
+    return punkd.analyze(text, top_n, template=ROAD_PROMPT_PREFIX)
+
+def punkd_analyze_batch(texts: List[str], top_n: int = 16) -> List[Dict[str, float]]:
+    return punkd.analyze_batch(texts, top_n, template=ROAD_PROMPT_PREFIX)
 
 def punkd_apply(prompt: str, weights: Dict[str, float], profile: str = "balanced") -> Tuple[str, float]:
-    if not weights: return prompt, 1.0
-    mean = sum(weights.values()) / len(weights)
-    mul = {"conservative":0.7, "balanced":1.0, "aggressive":1.6}.get(profile, 1.0)
-    adj = 1.0 + (mean-0.5)*1.2*mul
-    adj = max(0.6, min(2.2, adj))
-    markers = " ".join([f"<HAZ:{k}:{v:.2f}>" for k,v in sorted(weights.items(), key=lambda x: -x[1])[:8]])
-    return prompt + f"\n\n[PUNKD HAZARD BOOST] {markers}", adj
+    suffix, adj = punkd.markers(weights, profile)
+    return prompt + suffix, adj
+
+def punkd_patch(prompt: str, profile: str = "balanced",
+                weights: Optional[Dict[str, float]] = None) -> punkd.PunkdPatch:
+    # Per-chunk prompt patch: markers are built once (and follow generated
+    # text fed through patch.feed() with QRS_PUNKD_ADAPTIVE=1).
+    return punkd.PunkdPatch(weights if weights is not None else punkd.PunkdAnalyzer(prompt, ROAD_PROMPT_PREFIX),
+                            profile)
 
 # === CHUNKED GENERATION ===
 def chunked_generate(llm: Llama, prompt: str, max_total_tokens: int = 256, chunk_tokens: int = 64,
-                    base_temperature: float = 0.18, punkd_profile: str = "aggressive") -> str:
+                    base_temperature: float = 0.18, punkd_profile: str = "aggressive",
+                    weights: Optional[Dict[str, float]] = None) -> str:
     assembled = ""
     cur_prompt = prompt
-    token_weights = punkd_analyze(prompt, top_n=16)
+    patch = punkd_patch(prompt, punkd_profile, weights)
     iterations = max(1, (max_total_tokens + chunk_tokens - 1) // chunk_tokens)
     prev_tail = ""
+    trace = current_trace()
 
-    for _ in range(iterations):
-        patched_prompt, mult = punkd_apply(cur_prompt, token_weights, profile=punkd_profile)
+    for i in range(iterations):
+        patched_prompt, mult = patch(cur_prompt)
         temp = max(0.01, min(2.0, base_temperature * mult))
-        out = llm(patched_prompt, max_tokens=chunk_tokens, temperature=temp,
-                  stop=["Low", "Medium", "High", "\n", "\r"])
+        with trace.stage("generate_chunk", chunk=i) as rec:
+            out = llm(patched_prompt, max_tokens=chunk_tokens, temperature=temp,
+                      stop=["Low", "Medium", "High", "\n", "\r"])
+            if trace.enabled and isinstance(out, dict):
+                usage = out.get("usage") or {}
+                rec["tokens_in"] = usage.get("prompt_tokens")
+                rec["tokens_out"] = usage.get("completion_tokens")
         text = ""
         if isinstance(out, dict):
             try: text = out.get("choices", [{}])[0].get("text", "")
@@ -155,38 +332,59 @@ def chunked_generate(llm: Llama, prompt: str, max_total_tokens: int = 256, chunk
                 break
         append_text = text[overlap:] if overlap else text
         assembled += append_text
+        patch.feed(append_text)
         prev_tail = assembled[-140:] if len(assembled) > 140 else assembled
 
         if assembled.strip().endswith(("Low", "Medium", "High")): break
         if len(text.split()) < max(4, chunk_tokens//10): break
 
-        cur_prompt = prompt + "\n\nAssistant so far:\n" + assembled + "\n\nContinue:"
+        cur_prompt = continuation_prompt(prompt, assembled)
 
     return assembled.strip()
 
+# === CONSTRAINED CLASSIFICATION ===
+SCAN_MODE = os.environ.get("QRS_SCAN_MODE", "generate")
+
+def classify_risk(llm: Llama, prompt: str, punkd_profile: str = "aggressive",
+                  weights: Optional[Dict[str, float]] = None) -> Tuple[str, Dict[str, float]]:
+    import numpy as np
+    from llama_cpp import LogitsProcessorList
+    # One prompt evaluation and a single constrained sampling step: the logits
+    # processor records the next-token logits and masks everything but the
+    # label tokens, so no sampling loop or stop-string parsing is needed.
+    if weights is None:
+        weights = punkd_analyze(prompt, top_n=16)
+    patched_prompt, _ = punkd_apply(prompt, weights, profile=punkd_profile)
+    label_ids = label_first_tokens(llm)
+    allowed = np.array(sorted({t for ids in label_ids.values() for t in ids}), dtype=np.intc)
+    captured = {}
+
+    def capture(input_ids, scores):
+        captured["logits"] = scores[allowed].astype(np.float64)
+        masked = np.full_like(scores, -np.inf)
+        masked[allowed] = scores[allowed]
+        return masked
+
+    with current_trace().stage("classify", tokens_out=1):
+        llm(patched_prompt, max_tokens=1, temperature=0.0, logits_processor=LogitsProcessorList([capture]))
+    logits = captured.get("logits")
+    if logits is None or not len(allowed):
+        return "Medium", {label: 1.0 / len(RISK_LABELS) for label in RISK_LABELS}
+    by_id = dict(zip(allowed.tolist(), logits))
+    per_label = np.array([np.logaddexp.reduce([by_id[t] for t in label_ids[label]]) if label_ids[label] else -np.inf
+                          for label in RISK_LABELS])
+    probs = np.exp(per_label - per_label.max())
+    probs /= probs.sum()
+    probabilities = {label: float(p) for label, p in zip(RISK_LABELS, probs)}
+    return RISK_LABELS[int(np.argmax(probs))], probabilities
+
 # === INSANE PROMPT ===
-def build_road_scanner_prompt(lat: float, lon: float) -> str:
-    metrics = collect_system_metrics()
-    rgb = metrics_to_rgb(metrics)
-    score = pennylane_entropic_score(rgb)
-    entropy_text = entropic_summary_text(score)
-    metrics_line = f"sys_metrics: cpu={metrics['cpu']:.3f} mem={metrics['mem']:.3f} load={metrics['load1']:.3f} temp={metrics['temp']:.3f} proc={metrics['proc']:.3f}"
-    return f"""You are a Hypertime Nanobot specialized Road Risk Classification AI trained to evaluate real-world driving scenes.
+# Static instructions come first so their KV state can be cached (see
+# prefix_cache.py); only the scene block after ROAD_PROMPT_PREFIX changes.
+ROAD_PROMPT_PREFIX = """You are a Hypertime Nanobot specialized Road Risk Classification AI trained to evaluate real-world driving scenes.
 Analyze and Triple Check for validating accuracy the environmental and sensor data and determine the overall road risk level.
 Your reply must be only one word: Low, Medium, or High.
 
-[tuning]
-Scene details:
-Location: GPS coordinates {lat:.6f}, {lon:.6f}
-Road type: unknown (inferred from quantum resonance)
-Weather: unknown (inferred from entropic field)
-Traffic: unknown (inferred from system load)
-Obstacles: unknown (inferred from hazard resonance)
-Sensor notes: quantum-entangled device state
-{metrics_line}
-Quantum State: {entropy_text}
-[/tuning]
-
 Follow these strict rules when forming your decision:
 - Think through all scene factors internally but do not show reasoning.
 - Evaluate surface, visibility, weather, traffic, and obstacles holistically.
@@ -203,43 +401,445 @@ Follow these strict rules when forming your decision:
 5) Do not output internal reasoning or diagnostics; only return the single-word label.
 [/action]
 
+[tuning]
+Scene details:
+Road type: unknown (inferred from quantum resonance)
+Weather: unknown (inferred from entropic field)
+Traffic: unknown (inferred from system load)
+Obstacles: unknown (inferred from hazard resonance)
+Sensor notes: quantum-entangled device state
+"""
+
+def build_road_scanner_suffix(lat: float, lon: float, metrics: Optional[dict] = None,
+                              entropy_text: Optional[str] = None) -> str:
+    if metrics is None:
+        metrics = collect_system_metrics()
+    if entropy_text is None:
+        entropy_text = entropic_summary_text(pennylane_entropic_score(metrics_to_rgb(metrics)))
+    metrics_line = f"sys_metrics: cpu={metrics['cpu']:.3f} mem={metrics['mem']:.3f} load={metrics['load1']:.3f} temp={metrics['temp']:.3f} proc={metrics['proc']:.3f}"
+    return f"""Location: GPS coordinates {lat:.6f}, {lon:.6f}
+{metrics_line}
+Quantum State: {entropy_text}
+[/tuning]
+
 [replytemplate]
 Low | Medium | High
 [/replytemplate]"""
 
+def sizing_prompt() -> str:
+    # The widest prompt a scan can produce, used to size the context: the
+    # widest scene, the continuation wrapper (the generated text in it is
+    # counted by the generation budget) and PUNKD markers for the longest
+    # words in the prompt.
+    prompt = build_road_scanner_prompt(-89.999999, -179.999999, {k: 0.999 for k in ("cpu", "mem", "load1", "temp", "proc")},
+                                       "TURBULENT FIELD 0.999")
+    return continuation_prompt(prompt, "") + punkd.widest_markers(prompt)
+
+def build_road_scanner_prompt(lat: float, lon: float, metrics: Optional[dict] = None,
+                              entropy_text: Optional[str] = None) -> str:
+    return ROAD_PROMPT_PREFIX + build_road_scanner_suffix(lat, lon, metrics, entropy_text)
+
 # === MAIN SCAN FUNCTION (called from React Native) ===
-def run_quantum_scan(lat: float, lon: float) -> Dict[str, str]:
+def parse_verdict(result: str) -> str:
+    verdict = "Medium"
+    if "low" in result.lower(): verdict = "Low"
+    elif "high" in result.lower(): verdict = "High"
+    return verdict
+
+def generation_budget() -> int:
+    # Tokens a scan may generate under the loaded memory profile.
+    return int(MODEL_MANAGER.profile.get("max_tokens", 256))
+
+def scan_prompt(llm: Llama, prompt: str, mode: str = SCAN_MODE,
+                weights: Optional[Dict[str, float]] = None) -> Dict[str, object]:
+    # `weights`: PUNKD weights already computed for `prompt` (batch scans)
+    if mode == "classify":
+        verdict, probabilities = classify_risk(llm, prompt, punkd_profile="aggressive", weights=weights)
+        return {"verdict": verdict, "probabilities": probabilities}
+    result = chunked_generate(llm, prompt, max_total_tokens=generation_budget(), punkd_profile="aggressive",
+                              weights=weights)
+    with current_trace().stage("verdict_parse"):
+        verdict = parse_verdict(result)
+    return {"verdict": verdict}
+
+TIMINGS_DEFAULT = os.environ.get("QRS_TIMINGS", "0") == "1"
+
+# === SCAN HISTORY ===
+HISTORY_PATH = Path(os.environ.get("QRS_HISTORY_PATH", str(BASE_DIR / "scan_history.db")))
+HISTORY_ENABLED = os.environ.get("QRS_HISTORY", "1") == "1"
+
+def enable_history():
+    # Opens the encrypted history store (scan_history.py) on first use and
+    # flushes it at exit; aiosqlite is only imported here so scans still
+    # work without it.
+    if not HISTORY_ENABLED:
+        return None
+    try:
+        from scan_history import get_history, open_history
+    except ImportError:
+        return None
+    history = get_history()
+    if history is None or history.path != HISTORY_PATH:
+        history = open_history(HISTORY_PATH, get_key())
+        atexit.register(history.close)
+    return history
+
+def _record_history(lat: float, lon: float, result: Dict[str, object], scene: Dict[str, object], trace):
+    # Every scan path ends here, so the store is opened from the first
+    # recorded scan whoever the caller is (CLI, server or the RN bridge).
+    if result.get("verdict") == "ERROR":
+        return
+    try:
+        history = enable_history()
+    except Exception:
+        return  # a broken store must not fail the scan
+    if history is not None:
+        history.record(lat, lon, result, scene.get("metrics"), scene.get("score"),
+                       trace.to_dict() if trace.enabled else None)
+
+# === VERDICT CACHE ===
+CACHE_ENABLED = os.environ.get("QRS_CACHE", "1") == "1"
+CACHE_PATH = os.environ.get("QRS_CACHE_PATH")  # unset: memory only
+VERDICT_CACHE = None
+
+def verdict_cache():
+    # The shared VerdictCache (verdict_cache.py), or None when QRS_CACHE=0.
+    global VERDICT_CACHE
+    if not CACHE_ENABLED:
+        return None
+    if VERDICT_CACHE is None:
+        from verdict_cache import VerdictCache
+        VERDICT_CACHE = VerdictCache(path=CACHE_PATH, key=get_key() if CACHE_PATH else None)
+        if CACHE_PATH:
+            atexit.register(VERDICT_CACHE.flush)
+    return VERDICT_CACHE
+
+# === TIERED CASCADE ===
+CASCADE_ENABLED = os.environ.get("QRS_CASCADE", "0") == "1"
+CASCADE_MODEL = os.environ.get("QRS_CASCADE_MODEL")  # optional tiny GGUF tier
+CASCADE = None
+SMALL_MODEL_MANAGER = None
+
+def scan_cascade():
+    # The shared Cascade (cascade.py), or None unless QRS_CASCADE=1.
+    global CASCADE
+    if not CASCADE_ENABLED:
+        return None
+    if CASCADE is None:
+        from cascade import Cascade
+        CASCADE = Cascade()
+    return CASCADE
+
+def _small_model() -> Optional[ModelManager]:
+    global SMALL_MODEL_MANAGER
+    if SMALL_MODEL_MANAGER is None and CASCADE_MODEL and Path(CASCADE_MODEL).exists():
+        SMALL_MODEL_MANAGER = ModelManager(Path(CASCADE_MODEL))
+    return SMALL_MODEL_MANAGER
+
+def _fast_verdict(cas, lat: float, lon: float, metrics: Dict[str, float], score: float, entropy: str,
+                  trace) -> Optional[Dict[str, object]]:
+    # Answer from the first tier confident enough, or None to escalate.
+    from cascade import heuristic_verdict
+    with trace.stage("tier_heuristic"):
+        verdict, confidence, probs = heuristic_verdict(metrics, score)
+    tier = "heuristic"
+    small = _small_model()
+    if not cas.accept(confidence) and small is not None:
+        try:
+            with trace.stage("tier_small"), small.acquire() as llm:
+                verdict, probs = classify_risk(llm, build_road_scanner_prompt(lat, lon, metrics, entropy))
+            confidence, tier = probs[verdict], "small"
+        except Exception:
+            pass  # small tier unavailable: the full model decides
+    if not cas.accept(confidence):
+        return None
+    cas.answered(tier)
+    return {"verdict": verdict, "entropy": entropy, "tier": tier, "confidence": round(confidence, 3),
+            "probabilities": probs}
+
+def _audit_verdict(cas, fast: Dict[str, object], lat: float, lon: float, mode: str, metrics: Dict[str, float],
+                   entropy: str):
+    # Re-runs a fast answer on the full model in the background and records
+    # whether they agree.
+    def run():
+        try:
+            if decrypt_model() is not None:
+                full = _infer_verdict(lat, lon, mode, metrics, entropy, current_trace())
+                cas.audited(fast["tier"], fast["verdict"], full["verdict"])
+        except Exception:
+            pass
+    threading.Thread(target=run, name="qrs-cascade-audit", daemon=True).start()
+
+def _try_cascade(lat: float, lon: float, mode: str, metrics: Dict[str, float], score: float, entropy: str,
+                 trace) -> Optional[Dict[str, object]]:
+    cas = scan_cascade()
+    if cas is None:
+        return None
+    fast = _fast_verdict(cas, lat, lon, metrics, score, entropy, trace)
+    if fast is not None and cas.should_audit(fast["tier"]):
+        _audit_verdict(cas, fast, lat, lon, mode, metrics, entropy)
+    return fast
+
+def run_quantum_scan(lat: float, lon: float, mode: str = SCAN_MODE, timings: bool = TIMINGS_DEFAULT) -> Dict[str, object]:
+    # timings=True adds per-stage timings to the result; QRS_TRACE_PATH also
+    # appends every traced scan to a rotating JSONL file. Verdicts served from
+    # the verdict cache carry "cached": True; "tier" says which cascade tier
+    # answered (always "full" unless QRS_CASCADE=1).
+    with tracing(timings or TRACE_LOG is not None, lat=lat, lon=lon, mode=mode) as trace:
+        scene: Dict[str, object] = {}
+        result = _run_quantum_scan(lat, lon, mode, trace, scene)
+        if trace.enabled:
+            log_trace(trace, verdict=result["verdict"])
+            if timings:
+                result["timings"] = trace.to_dict()
+        _record_history(lat, lon, result, scene, trace)
+        return result
+
+def _run_quantum_scan(lat: float, lon: float, mode: str, trace, scene: Dict[str, object]) -> Dict[str, object]:
     try:
-        decrypt_model()
-        if not MODEL_PATH.exists():
+        with trace.stage("metrics"):
+            metrics = collect_system_metrics()
+        with trace.stage("quantum_score"):
+            score = pennylane_entropic_score(metrics_to_rgb(metrics))
+            entropy = entropic_summary_text(score)
+        scene.update(metrics=metrics, score=score)
+
+        cache = verdict_cache()
+        if cache is not None:
+            with trace.stage("cache_lookup"):
+                key, hit = cache.lookup(lat, lon, metrics, score, entropy, mode)
+            if hit is not None:
+                if "neighbor_m" in hit:
+                    _refresh_verdict(cache, key, lat, lon, mode, metrics, entropy)
+                return {**hit, "entropy": entropy}
+
+        fast = _try_cascade(lat, lon, mode, metrics, score, entropy, trace)
+        if fast is not None:
+            # heuristic answers cost less than a cache entry is worth
+            if cache is not None and fast["tier"] != "heuristic":
+                cache.put(key, lat, lon, fast)
+            return fast
+
+        if decrypt_model() is None:
             return {"verdict": "ERROR", "entropy": "MODEL MISSING"}
+        result = _infer_verdict(lat, lon, mode, metrics, entropy, trace)
+        if CASCADE is not None:
+            CASCADE.answered("full")
+        if cache is not None:
+            cache.put(key, lat, lon, result)
+        return result
+    except Exception as e:
+        return {"verdict": "ERROR", "entropy": str(e)}
 
-        prompt = build_road_scanner_prompt(lat, lon)
-        llm = Llama(model_path=str(MODEL_PATH), n_ctx=2048, n_threads=4)
-        result = chunked_generate(llm, prompt, punkd_profile="aggressive")
-        del llm
-
-        verdict = "Medium"
-        if "low" in result.lower(): verdict = "Low"
-        elif "high" in result.lower(): verdict = "High"
-
-        score = pennylane_entropic_score(metrics_to_rgb(collect_system_metrics()))
+def _infer_verdict(lat: float, lon: float, mode: str, metrics: Dict[str, float], entropy: str,
+                   trace) -> Dict[str, object]:
+    with trace.stage("prompt_build"):
+        prompt = build_road_scanner_prompt(lat, lon, metrics, entropy)
+    with MODEL_MANAGER.acquire() as llm:
+        prime_prompt_prefix(llm)
+        out = scan_prompt(llm, prompt, mode)
+    return {"verdict": out.pop("verdict"), "entropy": entropy, **out, "tier": "full", "model": MODEL_MANAGER.profile}
+
+def _refresh_verdict(cache, key: str, lat: float, lon: float, mode: str, metrics: Dict[str, float], entropy: str):
+    # Re-scans the exact cell behind a neighbour answer, once per key.
+    if not cache.claim_refresh(key):
+        return
+    def run():
+        try:
+            if decrypt_model() is not None:
+                cache.put(key, lat, lon, _infer_verdict(lat, lon, mode, metrics, entropy, current_trace()))
+        except Exception:
+            pass
+        finally:
+            cache.release_refresh(key)
+    threading.Thread(target=run, name="qrs-cache-refresh", daemon=True).start()
+
+def iter_quantum_scan(lat: float, lon: float,
+                      should_stop: Optional[Callable[[], bool]] = None) -> Iterator[Dict[str, object]]:
+    # Streaming variant of run_quantum_scan: yields {"token": ...} events as
+    # tokens are decoded and ends with the usual {"verdict", "entropy"} dict.
+    # `should_stop` (see scan_scheduler.py) cancels between tokens; a
+    # cancelled scan ends with verdict CANCELLED and is not recorded.
+    try:
+        metrics = collect_system_metrics()
+        score = pennylane_entropic_score(metrics_to_rgb(metrics))
         entropy = entropic_summary_text(score)
-
-        return {"verdict": verdict, "entropy": entropy}
+        scene = {"metrics": metrics, "score": score}
+        fast = _try_cascade(lat, lon, SCAN_MODE, metrics, score, entropy, current_trace())
+        if fast is not None:
+            _record_history(lat, lon, fast, scene, current_trace())
+            yield fast
+            return
+        if decrypt_model() is None:
+            yield {"verdict": "ERROR", "entropy": "MODEL MISSING"}
+            return
+        prompt = build_road_scanner_prompt(lat, lon, metrics, entropy)
+        patch = punkd_patch(prompt, "aggressive")
+        final = {}
+        with MODEL_MANAGER.acquire() as llm:
+            prime_prompt_prefix(llm)
+            for ev in stream_generate(llm, prompt, max_total_tokens=generation_budget(),
+                                      patch=patch, should_stop=should_stop):
+                if ev.get("done"):
+                    final = ev
+                else:
+                    patch.feed(ev["token"])
+                    yield ev
+        if should_stop is not None and should_stop() and not final.get("verdict"):
+            yield {"verdict": "CANCELLED", "entropy": entropy}
+            return
+        verdict = final.get("verdict") or parse_verdict(final.get("text", ""))
+        result = {"verdict": verdict, "entropy": entropy, "tier": "full"}
+        if CASCADE is not None:
+            CASCADE.answered("full")
+        _record_history(lat, lon, result, scene, current_trace())
+        yield result
     except Exception as e:
-        return {"verdict": "ERROR", "entropy": str(e)}
+        yield {"verdict": "ERROR", "entropy": str(e)}
+
+# === ROUTE / BATCH SCANS ===
+Point = Tuple[float, float]
+
+def decode_polyline(encoded: str, precision: int = 5) -> List[Point]:
+    # Google encoded polyline algorithm format.
+    points, index, lat, lon = [], 0, 0, 0
+    factor = 10 ** precision
+    while index < len(encoded):
+        deltas = []
+        for _ in range(2):
+            shift = result = 0
+            while True:
+                if index >= len(encoded):
+                    raise ValueError("truncated polyline")
+                b = ord(encoded[index]) - 63
+                index += 1
+                result |= (b & 0x1f) << shift
+                shift += 5
+                if b < 0x20:
+                    break
+            deltas.append(~(result >> 1) if result & 1 else result >> 1)
+        lat += deltas[0]
+        lon += deltas[1]
+        points.append((lat / factor, lon / factor))
+    return points
+
+def normalize_points(route: Union[str, dict, Iterable]) -> List[Point]:
+    # Accepts an encoded polyline, [[lat, lon], ...], [{"lat", "lon"}, ...]
+    # or a dict with "polyline" / "points".
+    if isinstance(route, str):
+        return decode_polyline(route)
+    if isinstance(route, dict):
+        if "polyline" in route:
+            return decode_polyline(route["polyline"], int(route.get("precision", 5)))
+        return normalize_points(route.get("points", []))
+    points = []
+    for p in route:
+        if isinstance(p, dict):
+            points.append((float(p["lat"]), float(p["lon"])))
+        else:
+            lat, lon = p
+            points.append((float(lat), float(lon)))
+    return points
+
+def iter_quantum_scan_batch(route: Union[str, dict, Iterable], mode: str = SCAN_MODE) -> Iterator[Dict[str, object]]:
+    # One model borrow, one metrics sample and one entropy score for the whole
+    # route. Every point shares the cached prompt prefix, so only its scene
+    # suffix is evaluated. llama-cpp-python's completion API has no
+    # multi-sequence decode, so points run back to back on that prefix.
+    try:
+        points = normalize_points(route)
+    except (ValueError, TypeError, KeyError) as e:
+        yield {"verdict": "ERROR", "entropy": f"Invalid route: {e}"}
+        return
+    if not points:
+        return
+    # a failure before or around the per-point guard (decrypt, model load,
+    # PUNKD) answers ERROR for every point not yet answered
+    done = 0
+    try:
+        if decrypt_model() is None:
+            raise FileNotFoundError("MODEL MISSING")
+        metrics = collect_system_metrics()
+        score = pennylane_entropic_score(metrics_to_rgb(metrics))
+        entropy = entropic_summary_text(score)
+        scene = {"metrics": metrics, "score": score}
+        cache = verdict_cache()
+        # every point's prompt differs only in its coordinates line; PUNKD scores
+        # them as one batch
+        prompts = [build_road_scanner_prompt(lat, lon, metrics, entropy) for lat, lon in points]
+        weights = punkd_analyze_batch(prompts)
+        with MODEL_MANAGER.acquire() as llm:
+            for i, (lat, lon) in enumerate(points):
+                try:
+                    key, hit = cache.lookup(lat, lon, metrics, score, entropy, mode, neighbor_m=0) if cache else (None, None)
+                    fast = None if hit is not None else _try_cascade(lat, lon, mode, metrics, score, entropy,
+                                                                      current_trace())
+                    if hit is not None:
+                        result = {"index": i, "lat": lat, "lon": lon, **hit, "entropy": entropy}
+                    elif fast is not None:
+                        result = {"index": i, "lat": lat, "lon": lon, **fast}
+                    else:
+                        prime_prompt_prefix(llm)
+                        out = scan_prompt(llm, prompts[i], mode, weights[i])
+                        result = {"index": i, "lat": lat, "lon": lon, "verdict": out.pop("verdict"),
+                                  "entropy": entropy, **out, "tier": "full"}
+                        if CASCADE is not None:
+                            CASCADE.answered("full")
+                        if cache is not None:
+                            cache.put(key, lat, lon, {k: v for k, v in result.items() if k not in ("index", "lat", "lon")})
+                    _record_history(lat, lon, result, scene, current_trace())
+                    yield result
+                except Exception as e:
+                    yield {"index": i, "lat": lat, "lon": lon, "verdict": "ERROR", "entropy": str(e)}
+                done = i + 1
+    except Exception as e:
+        for i, (lat, lon) in enumerate(points[done:], done):
+            yield {"index": i, "lat": lat, "lon": lon, "verdict": "ERROR", "entropy": str(e)}
+
+def run_quantum_scan_batch(route: Union[str, dict, Iterable], mode: str = SCAN_MODE) -> List[Dict[str, object]]:
+    return list(iter_quantum_scan_batch(route, mode))
 
 # === WASM ENTRYPOINT (called from React Native) ===
 if __name__ == "__main__":
-    import sys
-    if len(sys.argv) == 3:
+    history = enable_history() if len(sys.argv) > 2 or sys.argv[-1] == "--batch" else None
+    if len(sys.argv) in (3, 4) and sys.argv[-1] not in ("--batch", "--stream"):
         try:
             lat = float(sys.argv[1])
             lon = float(sys.argv[2])
-            result = run_quantum_scan(lat, lon)
+            if len(sys.argv) == 4 and sys.argv[3] != "--timings":
+                raise ValueError(sys.argv[3])
+            result = run_quantum_scan(lat, lon, timings=len(sys.argv) == 4 or TIMINGS_DEFAULT)
             print(json.dumps(result))
         except:
             print(json.dumps({"verdict": "ERROR", "entropy": "Invalid args"}))
+    elif len(sys.argv) == 4 and sys.argv[3] == "--stream":
+        # token events as JSON lines, then the result line
+        try:
+            lat, lon = float(sys.argv[1]), float(sys.argv[2])
+        except ValueError:
+            print(json.dumps({"verdict": "ERROR", "entropy": "Invalid args"}))
+        else:
+            for ev in iter_quantum_scan(lat, lon):
+                print(json.dumps(ev), flush=True)
+    elif len(sys.argv) == 2 and sys.argv[1] == "--batch":
+        # JSON route on stdin, one JSON line per point on stdout
+        try:
+            route = json.load(sys.stdin)
+        except ValueError:
+            print(json.dumps({"verdict": "ERROR", "entropy": "Invalid batch JSON"}))
+        else:
+            for result in iter_quantum_scan_batch(route):
+                print(json.dumps(result), flush=True)
+    elif len(sys.argv) == 2 and sys.argv[1] == "--warm":
+        # READY goes out before the imports; the second line reports the warm-up result
+        loader = preload()
+        print(json.dumps({"verdict": "READY", "entropy": "QRS Online"}), flush=True)
+        loader.join()
+        if MODEL_MANAGER.loaded:
+            print(json.dumps({"verdict": "READY", "entropy": "QRS Online (model resident)", "model": MODEL_MANAGER.profile}))
+        else:
+            print(json.dumps({"verdict": "READY", "entropy": MODEL_MANAGER.last_error or "MODEL MISSING"}))
     else:
         print(json.dumps({"verdict": "READY", "entropy": "QRS Online"}))
+    if history is not None:
+        history.close()
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# python-backend/memory_profile.py
+# Memory-budgeted llama.cpp load settings. n_ctx is sized from the real
+# tokenized scan prompt plus the generation budget instead of a fixed 2048,
+# weights are mmap'd, the KV cache is quantized, and the estimated footprint
+# (weights not already in RAM + KV cache + compute buffers) is checked against
+# available memory. Over budget, the plan steps down (smaller batch, 4-bit KV,
+# tight context, fewer threads) and finally refuses with MemoryError rather
+# than letting the low-memory killer take the process.
+
+import os
+import struct
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+from inference_config import inference_params
+
+try:
+    import psutil
+except:
+    psutil = None
+
+GEN_TOKENS = int(os.environ.get("QRS_GEN_TOKENS", "256"))    # generated tokens per scan
+CHUNK_TOKENS = 64                                             # one continuation chunk
+CTX_MARGIN = 32
+CTX_STEP = 128
+KV_TYPE = os.environ.get("QRS_KV_TYPE", "q8_0")               # f16 | q8_0 | q4_0
+USE_MLOCK = os.environ.get("QRS_MLOCK", "0") == "1"
+HEADROOM = float(os.environ.get("QRS_MEM_HEADROOM", "0.8"))   # usable share of available memory
+OVERHEAD_MB = 64.0
+
+# ggml type ids and bytes per element (block size folded in)
+GGML_TYPES = {"f16": (1, 2.0), "q8_0": (8, 34 / 32), "q4_0": (2, 18 / 32)}
+# llama-3-8B shapes, used when the GGUF header cannot be read
+DEFAULT_SHAPE = {"n_layer": 32, "n_embd": 4096, "n_head": 32, "n_head_kv": 8, "n_vocab": 128256}
+
+# === GGUF HEADER ===
+MAX_STR = 1 << 24  # longest header string (chat templates run to tens of KB)
+_SCALARS = {0: "<B", 1: "<b", 2: "<H", 3: "<h", 4: "<I", 5: "<i", 6: "<f", 7: "<?", 10: "<Q", 11: "<q", 12: "<d"}
+
+def _read(f, fmt: str):
+    size = struct.calcsize(fmt)
+    data = f.read(size)
+    if len(data) != size:
+        raise ValueError("truncated GGUF header")
+    return struct.unpack(fmt, data)[0]
+
+def _read_str(f) -> str:
+    n = _read(f, "<Q")
+    if n > MAX_STR:
+        raise ValueError("corrupt GGUF header")
+    return f.read(n).decode("utf-8", "replace")
+
+def _read_value(f, vtype: int):
+    if vtype in _SCALARS:
+        return _read(f, _SCALARS[vtype])
+    if vtype == 8:
+        return _read_str(f)
+    if vtype == 9:
+        etype, n = _read(f, "<I"), _read(f, "<Q")
+        if etype in _SCALARS:
+            f.seek(n * struct.calcsize(_SCALARS[etype]), os.SEEK_CUR)
+        else:
+            for _ in range(n):
+                _read_value(f, etype)
+        return n  # arrays only matter by length (tokenizer.ggml.tokens)
+    raise ValueError(f"unknown GGUF value type {vtype}")
+
+def gguf_shape(path: Path) -> Dict[str, int]:
+    # Layer count, widths and vocab size from the GGUF key/value header.
+    with open(path, "rb") as f:
+        if f.read(4) != b"GGUF":
+            raise ValueError("not a GGUF file")
+        version = _read(f, "<I")
+        count_fmt = "<I" if version == 1 else "<Q"
+        _read(f, count_fmt)                      # tensor count
+        kv = {}
+        for _ in range(_read(f, count_fmt)):
+            key = _read_str(f)
+            kv[key] = _read_value(f, _read(f, "<I"))
+    arch = kv.get("general.architecture", "llama")
+    shape = {
+        "n_layer": kv.get(f"{arch}.block_count"),
+        "n_embd": kv.get(f"{arch}.embedding_length"),
+        "n_head": kv.get(f"{arch}.attention.head_count"),
+        "n_head_kv": kv.get(f"{arch}.attention.head_count_kv") or kv.get(f"{arch}.attention.head_count"),
+        "n_vocab": kv.get(f"{arch}.vocab_size") or kv.get("tokenizer.ggml.tokens"),
+    }
+    if not all(shape.values()):
+        raise ValueError("GGUF header lacks model shape")
+    return {k: int(v) for k, v in shape.items()}
+
+def model_shape(path: Path) -> Tuple[Dict[str, int], bool]:
+    try:
+        return gguf_shape(path), True
+    except (OSError, ValueError, struct.error):
+        return dict(DEFAULT_SHAPE), False
+
+# === MEMORY ===
+def available_mb() -> Optional[float]:
+    if psutil is not None:
+        return psutil.virtual_memory().available / 2**20
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+def _in_ram(path: Path) -> bool:
+    # memfd / tmpfs copies are already resident and already excluded from
+    # MemAvailable, so mapping them costs nothing extra.
+    s = str(path)
+    return s.startswith("/proc/") or s.startswith("/dev/shm/")
+
+def estimate_mb(shape: Dict[str, int], weights_bytes: int, n_ctx: int, n_batch: int, kv_type: str) -> Dict[str, float]:
+    kv_elem = GGML_TYPES[kv_type][1]
+    n_embd_kv = shape["n_embd"] * shape["n_head_kv"] // shape["n_head"]
+    kv = 2 * shape["n_layer"] * n_ctx * n_embd_kv * kv_elem
+    compute = n_batch * (4 * shape["n_embd"] + shape["n_vocab"]) * 4
+    out = {"weights": weights_bytes / 2**20, "kv": kv / 2**20, "compute": compute / 2**20, "overhead": OVERHEAD_MB}
+    out["total"] = sum(out.values())
+    return {k: round(v, 1) for k, v in out.items()}
+
+# === PLAN ===
+def context_for(prompt_tokens: int, gen_tokens: int = GEN_TOKENS, step: int = CTX_STEP) -> int:
+    # The longest context a scan builds: the prompt (main.sizing_prompt
+    # includes the continuation wrapper and PUNKD markers), the generated
+    # text fed back in ("Assistant so far"), one more chunk and a margin.
+    need = prompt_tokens + gen_tokens + CHUNK_TOKENS + CTX_MARGIN
+    return -(-need // step) * step
+
+def plan_load(model_path: Path, prompt_tokens: int, workers: int = 1, overrides: Optional[Dict[str, object]] = None,
+              gen_tokens: int = GEN_TOKENS, avail_mb: Optional[float] = None) -> Tuple[Dict[str, object], Dict[str, object]]:
+    # (Llama kwargs, profile report). Raises MemoryError when even the
+    # smallest plan does not fit. Explicit `overrides` are applied as-is.
+    # profile["max_tokens"] is the generation budget the context was sized
+    # for; callers must not generate past it.
+    overrides = dict(overrides or {})
+    model_path = Path(model_path)
+    shape, from_header = model_shape(model_path)
+    weights = 0 if _in_ram(model_path) else model_path.stat().st_size
+    avail = available_mb() if avail_mb is None else avail_mb
+    budget = None if avail is None else avail * HEADROOM
+    threads = inference_params(workers)
+    kv_type = KV_TYPE if KV_TYPE in GGML_TYPES else "q8_0"
+
+    # level, generation budget, ctx rounding, n_batch, KV type, threads
+    ladder = [
+        ("normal", gen_tokens, CTX_STEP, threads["n_batch"], kv_type, threads["n_threads"]),
+        ("small_batch", gen_tokens, CTX_STEP, 128, kv_type, threads["n_threads"]),
+        ("kv_q4", gen_tokens, CTX_STEP, 128, "q4_0", threads["n_threads"]),
+        ("tight_ctx", gen_tokens // 2, 32, 64, "q4_0", max(1, threads["n_threads"] // 2)),
+    ]
+    for level, gen, step, n_batch, kv, n_threads in ladder:
+        n_ctx = int(overrides.get("n_ctx", context_for(prompt_tokens, gen, step)))
+        n_batch = min(int(overrides.get("n_batch", n_batch)), n_ctx)
+        est = estimate_mb(shape, weights, n_ctx, n_batch, kv)
+        if budget is None or est["total"] <= budget or "n_ctx" in overrides:
+            break
+    else:
+        raise MemoryError(f"model needs ~{est['total']:.0f} MB at minimum, "
+                          f"{budget:.0f} MB usable of {avail:.0f} MB available")
+
+    type_id = GGML_TYPES[kv][0]
+    params = {
+        "n_ctx": n_ctx,
+        "n_batch": n_batch,
+        "n_threads": n_threads,
+        "n_threads_batch": threads["n_threads_batch"] if n_threads == threads["n_threads"] else n_threads,
+        "use_mmap": True,
+        "use_mlock": USE_MLOCK,
+        "type_k": type_id,
+        "type_v": type_id,
+        # llama.cpp only quantizes the V cache with flash attention on
+        "flash_attn": kv != "f16",
+    }
+    params.update(overrides)
+    profile = {
+        "level": level,
+        "n_ctx": params["n_ctx"], "n_batch": params["n_batch"], "n_threads": params["n_threads"],
+        "kv_type": kv, "use_mmap": params["use_mmap"], "use_mlock": params["use_mlock"],
+        "prompt_tokens": prompt_tokens, "max_tokens": gen,
+        "estimate_mb": est,
+        "available_mb": None if avail is None else round(avail, 1),
+        "shape_from_header": from_header,
+    }
+    return params, profile
+
+def count_prompt_tokens(llama_cls: Callable, model_path: Path, prompt: str) -> int:
+    # Tokenizes with a vocab-only load, which skips the weights.
+    vocab = llama_cls(model_path=str(model_path), vocab_only=True, verbose=False)
+    try:
+        return len(vocab.tokenize(prompt.encode("utf-8"), add_bos=True))
+    finally:
+        del vocab
+
+if __name__ == "__main__":
+    import json
+    import sys
+    if len(sys.argv) < 2:
+        print("usage: memory_profile.py MODEL.gguf [PROMPT_TOKENS]", file=sys.stderr)
+        sys.exit(2)
+    tokens = int(sys.argv[2]) if len(sys.argv) > 2 else 600
+    try:
+        print(json.dumps(plan_load(Path(sys.argv[1]), tokens)[1]))
+    except MemoryError as e:
+        print(json.dumps({"verdict": "ERROR", "entropy": str(e)}))
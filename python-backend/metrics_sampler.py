@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# python-backend/metrics_sampler.py
+# Background system-metrics sampler. A daemon thread reads cpu, memory, load,
+# thermal and process-count values every `interval` seconds into a ring
+# buffer, so scans read the latest sample (or a windowed mean) without ever
+# blocking on psutil.cpu_percent(interval).
+
+import os
+import time
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Deque, Dict, Optional, Tuple
+
+try:
+    import psutil
+except:
+    psutil = None
+
+THERMAL_ROOT = Path("/sys/class/thermal")
+# Fallbacks used when a reading is unavailable (the old hard-coded values).
+DEFAULTS = {"cpu": 0.3, "mem": 0.4, "load1": 0.2, "temp": 0.5, "proc": 0.1}
+TEMP_MAX_C = 100.0
+PROC_MAX = 1000.0
+
+def _clamp(x: float) -> float:
+    return max(0.0, min(1.0, x))
+
+class MetricsSampler:
+    def __init__(self, interval: float = 1.0, history: int = 120):
+        self.interval = interval
+        self._buf: Deque[Tuple[float, Dict[str, float]]] = deque(maxlen=history)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._sample_lock = threading.Lock()
+        self._cpu_primed = False
+        self._cpu_prev: Optional[Tuple[int, int]] = None
+        self._thermal_zones = sorted(THERMAL_ROOT.glob("thermal_zone*/temp")) if THERMAL_ROOT.exists() else []
+        self._ncpu = os.cpu_count() or 1
+
+    # --- readers ---
+    def _cpu(self) -> Optional[float]:
+        if psutil:
+            try:
+                # the first non-blocking call only primes psutil's counters
+                c = psutil.cpu_percent(None) / 100
+                primed, self._cpu_primed = self._cpu_primed, True
+                return c if primed else None
+            except Exception:
+                pass
+        try:
+            with open("/proc/stat") as f:
+                fields = [int(x) for x in f.readline().split()[1:]]
+        except (OSError, ValueError):
+            return None
+        idle, total = fields[3] + (fields[4] if len(fields) > 4 else 0), sum(fields)
+        prev, self._cpu_prev = self._cpu_prev, (idle, total)
+        if prev is None or total == prev[1]:
+            return None
+        return 1.0 - (idle - prev[0]) / (total - prev[1])
+
+    def _mem(self) -> Optional[float]:
+        if psutil:
+            try:
+                return psutil.virtual_memory().percent / 100
+            except Exception:
+                pass
+        try:
+            info = {}
+            with open("/proc/meminfo") as f:
+                for line in f:
+                    k, v = line.split(":", 1)
+                    info[k] = int(v.split()[0])
+            return 1.0 - info["MemAvailable"] / info["MemTotal"]
+        except (OSError, ValueError, KeyError, ZeroDivisionError):
+            return None
+
+    def _load1(self) -> Optional[float]:
+        try:
+            return os.getloadavg()[0] / self._ncpu
+        except (OSError, AttributeError):
+            return None
+
+    def _temp(self) -> Optional[float]:
+        best = None
+        for zone in self._thermal_zones:
+            try:
+                c = int(zone.read_text().strip()) / 1000.0
+            except (OSError, ValueError):
+                continue
+            if c > 0 and (best is None or c > best):
+                best = c
+        return None if best is None else best / TEMP_MAX_C
+
+    def _proc(self) -> Optional[float]:
+        try:
+            n = len(psutil.pids()) if psutil else sum(1 for d in os.listdir("/proc") if d.isdigit())
+        except Exception:
+            return None
+        return n / PROC_MAX
+
+    def sample(self) -> Dict[str, float]:
+        with self._sample_lock:
+            raw = {"cpu": self._cpu(), "mem": self._mem(), "load1": self._load1(),
+                   "temp": self._temp(), "proc": self._proc()}
+        m = {k: _clamp(float(DEFAULTS[k] if v is None else v)) for k, v in raw.items()}
+        with self._lock:
+            self._buf.append((time.monotonic(), m))
+        return m
+
+    # --- thread ---
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.sample()
+            except Exception:
+                pass
+
+    def start(self) -> "MetricsSampler":
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return self
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="qrs-metrics", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        t, self._thread = self._thread, None
+        if t is not None:
+            t.join(timeout=self.interval * 2)
+
+    # --- non-blocking reads ---
+    def latest(self) -> Dict[str, float]:
+        with self._lock:
+            if self._buf:
+                return dict(self._buf[-1][1])
+        # first read: prime cpu counters and take one immediate sample
+        self.start()
+        return self.sample()
+
+    def mean(self, window: float = 10.0) -> Dict[str, float]:
+        cutoff = time.monotonic() - window
+        with self._lock:
+            recent = [m for t, m in self._buf if t >= cutoff]
+        if not recent:
+            return self.latest()
+        return {k: sum(m[k] for m in recent) / len(recent) for k in DEFAULTS}
+
+SAMPLER = MetricsSampler()
+
+def collect_system_metrics(window: Optional[float] = None) -> Dict[str, float]:
+    SAMPLER.start()
+    return SAMPLER.mean(window) if window else SAMPLER.latest()
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+# python-backend/model_container.py
+# Segmented AES-GCM container for the encrypted GGUF model.
+# The model is sealed in fixed-size segments, each with its own nonce and tag,
+# so it can be decrypted as a stream with one segment in memory at a time and
+# written straight into an anonymous memfd that llama.cpp mmaps by path.
+
+import os
+import json
+import struct
+import hashlib
+import tempfile
+import threading
+from pathlib import Path
+from typing import Dict, Iterator, NamedTuple, Optional, Tuple
+
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+# === FORMAT ===
+# header    : magic(4) version(1) segment_size(4) plain_size(8) nonce_prefix(7) fingerprint(32)
+# segment i : AES-GCM(nonce = nonce_prefix | i (4, BE) | last (1)) -> ciphertext + tag(16)
+# Every segment authenticates the fixed header part. Only the last segment also
+# authenticates the fingerprint (sha256 of the plaintext), because the writer
+# only knows it once the whole stream has been seen.
+MAGIC = b"QRSC"
+VERSION = 1
+DEFAULT_SEGMENT_SIZE = 4 << 20
+TAG_SIZE = 16
+LEGACY_NONCE_SIZE = 12
+READ_BLOCK = 1 << 20
+_FIXED = struct.Struct(">4sBIQ7s")
+HEADER_SIZE = _FIXED.size + 32
+
+class ContainerHeader(NamedTuple):
+    version: int
+    segment_size: int
+    plain_size: int
+    nonce_prefix: bytes
+    fingerprint: bytes
+
+    @property
+    def fixed(self) -> bytes:
+        return _FIXED.pack(MAGIC, self.version, self.segment_size, self.plain_size, self.nonce_prefix)
+
+    @property
+    def segments(self) -> int:
+        return max(1, (self.plain_size + self.segment_size - 1) // self.segment_size)
+
+def _nonce(prefix: bytes, index: int, last: bool) -> bytes:
+    return prefix + struct.pack(">IB", index, 1 if last else 0)
+
+def read_header(path: Path) -> Optional[ContainerHeader]:
+    try:
+        with open(path, "rb") as f:
+            raw = f.read(HEADER_SIZE)
+    except OSError:
+        return None
+    if len(raw) != HEADER_SIZE or raw[:4] != MAGIC:
+        return None
+    magic, version, seg, size, prefix = _FIXED.unpack(raw[:_FIXED.size])
+    if version != VERSION or seg <= 0:
+        return None
+    return ContainerHeader(version, seg, size, prefix, raw[_FIXED.size:])
+
+def is_container(path: Path) -> bool:
+    return read_header(path) is not None
+
+# === WRITER ===
+class _SegmentWriter:
+    # Holds back one segment so the final one can be flagged and bound to the
+    # fingerprint once the plaintext stream ends.
+    def __init__(self, out, key: bytes, plain_size: int, segment_size: int):
+        self.out = out
+        self.aes = AESGCM(key)
+        self.segment_size = segment_size
+        self.header = ContainerHeader(VERSION, segment_size, plain_size, os.urandom(7), b"\0" * 32)
+        self.index = 0
+        self.buf = bytearray()
+        self.sha = hashlib.sha256()
+        out.write(self.header.fixed + self.header.fingerprint)
+
+    def write(self, data: bytes):
+        self.sha.update(data)
+        self.buf += data
+        while len(self.buf) > self.segment_size:
+            seg = bytes(self.buf[:self.segment_size])
+            del self.buf[:self.segment_size]
+            self._seal(seg, last=False)
+
+    def _seal(self, seg: bytes, last: bool):
+        aad = self.header.fixed + (self.header.fingerprint if last else b"")
+        self.out.write(self.aes.encrypt(_nonce(self.header.nonce_prefix, self.index, last), seg, aad))
+        self.index += 1
+
+    def finish(self) -> bytes:
+        self.header = self.header._replace(fingerprint=self.sha.digest())
+        self._seal(bytes(self.buf), last=True)
+        self.buf = bytearray()
+        self.out.seek(_FIXED.size)
+        self.out.write(self.header.fingerprint)
+        return self.header.fingerprint
+
+def _atomic_output(dst: Path):
+    fd, tmp = tempfile.mkstemp(dir=str(dst.parent), prefix=dst.name + ".", suffix=".tmp")
+    return os.fdopen(fd, "w+b"), Path(tmp)
+
+def encrypt_file(src: Path, dst: Path, key: bytes, segment_size: int = DEFAULT_SEGMENT_SIZE) -> bytes:
+    src, dst = Path(src), Path(dst)
+    out, tmp = _atomic_output(dst)
+    try:
+        with out, open(src, "rb") as f:
+            w = _SegmentWriter(out, key, src.stat().st_size, segment_size)
+            for block in iter(lambda: f.read(READ_BLOCK), b""):
+                w.write(block)
+            fp = w.finish()
+        os.replace(tmp, dst)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    return fp
+
+def convert_legacy(src: Path, dst: Path, key: bytes, segment_size: int = DEFAULT_SEGMENT_SIZE) -> bytes:
+    # Old .aes files are nonce(12) + one AES-GCM blob. Stream them through a
+    # GCM decryptor (tag read up front) so the conversion never holds the
+    # model in memory; the new container only replaces dst once the legacy
+    # tag has verified. src and dst may be the same path.
+    src, dst = Path(src), Path(dst)
+    total = src.stat().st_size
+    if total < LEGACY_NONCE_SIZE + TAG_SIZE:
+        raise ValueError(f"{src} is too short to be a legacy AES-GCM blob")
+    out, tmp = _atomic_output(dst)
+    try:
+        with out, open(src, "rb") as f:
+            nonce = f.read(LEGACY_NONCE_SIZE)
+            f.seek(total - TAG_SIZE)
+            tag = f.read(TAG_SIZE)
+            f.seek(LEGACY_NONCE_SIZE)
+            dec = Cipher(algorithms.AES(key), modes.GCM(nonce, tag)).decryptor()
+            w = _SegmentWriter(out, key, total - LEGACY_NONCE_SIZE - TAG_SIZE, segment_size)
+            remaining = w.header.plain_size
+            while remaining:
+                block = f.read(min(READ_BLOCK, remaining))
+                if not block:
+                    raise ValueError(f"{src} ended early")
+                remaining -= len(block)
+                w.write(dec.update(block))
+            dec.finalize()
+            fp = w.finish()
+        os.replace(tmp, dst)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    return fp
+
+# === READER ===
+def iter_decrypt(src: Path, key: bytes) -> Iterator[bytes]:
+    hdr = read_header(src)
+    if hdr is None:
+        raise ValueError(f"{src} is not a QRS model container")
+    aes = AESGCM(key)
+    remaining = hdr.plain_size
+    with open(src, "rb") as f:
+        f.seek(HEADER_SIZE)
+        for i in range(hdr.segments):
+            last = i == hdr.segments - 1
+            n = min(hdr.segment_size, remaining)
+            blob = f.read(n + TAG_SIZE)
+            if len(blob) != n + TAG_SIZE:
+                raise ValueError(f"{src} is truncated at segment {i}")
+            aad = hdr.fixed + (hdr.fingerprint if last else b"")
+            yield aes.decrypt(_nonce(hdr.nonce_prefix, i, last), blob, aad)
+            remaining -= n
+        if f.read(1):
+            raise ValueError(f"{src} has trailing data")
+
+def decrypt_to_path(src: Path, dst: Path, key: bytes) -> Path:
+    src, dst = Path(src), Path(dst)
+    out, tmp = _atomic_output(dst)
+    try:
+        with out:
+            for chunk in iter_decrypt(src, key):
+                out.write(chunk)
+        os.chmod(tmp, 0o600)
+        os.replace(tmp, dst)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    _write_stamp(dst, read_header(src).fingerprint)
+    return dst
+
+# === FINGERPRINTS ===
+def _stamp_path(path: Path) -> Path:
+    return path.with_name(path.name + ".fp")
+
+def _file_stamp(path: Path) -> list:
+    st = path.stat()
+    return [st.st_ino, st.st_size, st.st_mtime_ns]
+
+def _write_stamp(path: Path, fingerprint: bytes):
+    try:
+        _stamp_path(path).write_text(json.dumps({"fingerprint": fingerprint.hex(), "stamp": _file_stamp(path)}))
+    except OSError:
+        pass
+
+def plain_fingerprint(path: Path) -> Optional[bytes]:
+    # sha256 of a plaintext model, cached in a sidecar keyed by inode/size/mtime
+    # so an unchanged file is only ever hashed once.
+    path = Path(path)
+    if not path.exists():
+        return None
+    try:
+        cached = json.loads(_stamp_path(path).read_text())
+        if cached["stamp"] == _file_stamp(path):
+            return bytes.fromhex(cached["fingerprint"])
+    except (OSError, ValueError, KeyError):
+        pass
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(READ_BLOCK), b""):
+            sha.update(block)
+    _write_stamp(path, sha.digest())
+    return sha.digest()
+
+def model_fingerprint(path: Path) -> Optional[bytes]:
+    hdr = read_header(path)
+    return hdr.fingerprint if hdr else plain_fingerprint(path)
+
+# === ANONYMOUS MAPPINGS ===
+# fingerprint -> (fd, path) of models already decrypted in this process
+_OPEN: Dict[bytes, Tuple[int, Path]] = {}
+_OPEN_LOCK = threading.Lock()
+
+def _anonymous_fd(name: str) -> Optional[int]:
+    if hasattr(os, "memfd_create"):
+        try:
+            return os.memfd_create(name)
+        except OSError:
+            pass
+    if os.path.isdir("/dev/shm"):
+        try:
+            fd, tmp = tempfile.mkstemp(dir="/dev/shm", prefix=name + ".")
+            os.unlink(tmp)
+            return fd
+        except OSError:
+            pass
+    return None
+
+def open_decrypted_model(src: Path, key: bytes, fallback: Optional[Path] = None) -> Path:
+    # Returns a path llama.cpp can mmap. Prefers an existing plaintext copy with
+    # a matching fingerprint, then a memfd/tmpfs mapping (/proc/<pid>/fd/N),
+    # and only writes plaintext to `fallback` when neither is available.
+    hdr = read_header(src)
+    if hdr is None:
+        raise ValueError(f"{src} is not a QRS model container")
+    with _OPEN_LOCK:
+        hit = _OPEN.get(hdr.fingerprint)
+        if hit is not None:
+            return hit[1]
+        if fallback is not None and Path(fallback).exists() and plain_fingerprint(fallback) == hdr.fingerprint:
+            return Path(fallback)
+        fd = _anonymous_fd("qrs-model")
+        if fd is None:
+            if fallback is None:
+                raise OSError("no anonymous memory available for model decryption")
+            return decrypt_to_path(src, fallback, key)
+        try:
+            with os.fdopen(os.dup(fd), "wb") as out:
+                for chunk in iter_decrypt(src, key):
+                    out.write(chunk)
+        except BaseException:
+            os.close(fd)
+            raise
+        path = Path(f"/proc/{os.getpid()}/fd/{fd}")
+        _OPEN[hdr.fingerprint] = (fd, path)
+        return path
+
+def release_decrypted_models():
+    with _OPEN_LOCK:
+        for fd, _ in _OPEN.values():
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+        _OPEN.clear()
+
+# === CLI ===
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) != 4 or sys.argv[1] not in ("convert", "encrypt", "info"):
+        print("usage: model_container.py convert|encrypt <src> <dst> | info <src> -", file=sys.stderr)
+        sys.exit(2)
+    cmd, a, b = sys.argv[1], Path(sys.argv[2]), Path(sys.argv[3])
+    if cmd == "info":
+        h = read_header(a)
+        print(json.dumps(None if h is None else {"segment_size": h.segment_size, "plain_size": h.plain_size,
+                                                  "segments": h.segments, "fingerprint": h.fingerprint.hex()}))
+    else:
+        key_path = Path(os.environ.get("QRS_KEY_PATH", Path(__file__).parent / ".enc_key"))
+        key = key_path.read_bytes()[:32]
+        fp = convert_legacy(a, b, key) if cmd == "convert" else encrypt_file(a, b, key)
+        print(fp.hex())
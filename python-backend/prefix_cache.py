@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# python-backend/prefix_cache.py
+# KV-state cache for the static part of the road-scanner prompt.
+# The prefix is evaluated once per (model, template, context) and its llama.cpp
+# state is kept in memory and sealed to disk, so later scans, continuation
+# chunks and cold starts only evaluate the dynamic suffix. llama-cpp's own
+# longest-prefix match in `generate` does the rest once the state is loaded.
+
+import os
+import json
+import struct
+import hashlib
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from llama_cpp import Llama, LlamaState
+
+# === FORMAT ===
+# file : nonce(12) | AES-GCM(header_len(4, BE) | header json | input_ids | llama_state)
+# Only the tokens and the raw llama.cpp state are stored. `scores` are not
+# needed without logits_all (the suffix decode refreshes them), so a single
+# zero row is restored and broadcast by Llama.load_state.
+_LEN = struct.Struct(">I")
+NONCE_SIZE = 12
+
+def template_hash(prefix: str) -> str:
+    return hashlib.sha256(prefix.encode("utf-8")).hexdigest()
+
+class PrefixStateCache:
+    def __init__(self, cache_dir: Path, key: Optional[bytes] = None, max_entries: int = 2):
+        self.cache_dir = Path(cache_dir)
+        self.key = key
+        self.max_entries = max_entries
+        self.hits = self.misses = self.disk_hits = 0
+        self._lock = threading.Lock()
+        self._mem: Dict[str, LlamaState] = {}
+
+    def cache_key(self, llm: Llama, prefix: str, fingerprint: bytes) -> str:
+        ctx = json.dumps({"n_ctx": llm.n_ctx(), "n_vocab": llm.n_vocab()}, sort_keys=True)
+        return hashlib.sha256(fingerprint + template_hash(prefix).encode() + ctx.encode()).hexdigest()[:32]
+
+    def _path(self, name: str) -> Path:
+        return self.cache_dir / f"prefix-{name}.kv"
+
+    # --- disk ---
+    def _store(self, name: str, state: LlamaState):
+        if self.key is None:
+            return
+        ids = np.asarray(state.input_ids[:state.n_tokens], dtype=np.intc).tobytes()
+        header = json.dumps({"n_tokens": int(state.n_tokens), "llama_state_size": int(state.llama_state_size),
+                             "seed": int(state.seed), "ids_len": len(ids)}).encode()
+        nonce = os.urandom(NONCE_SIZE)
+        blob = AESGCM(self.key).encrypt(nonce, _LEN.pack(len(header)) + header + ids + state.llama_state,
+                                        name.encode())
+        path = self._path(name)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")  # pool workers may save concurrently
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp.write_bytes(nonce + blob)
+            os.replace(tmp, path)
+        except OSError:
+            tmp.unlink(missing_ok=True)
+
+    def _load(self, name: str, llm: Llama) -> Optional[LlamaState]:
+        path = self._path(name)
+        if self.key is None or not path.exists():
+            return None
+        try:
+            raw = path.read_bytes()
+            plain = AESGCM(self.key).decrypt(raw[:NONCE_SIZE], raw[NONCE_SIZE:], name.encode())
+            (hlen,) = _LEN.unpack_from(plain)
+            header = json.loads(plain[_LEN.size:_LEN.size + hlen])
+            off = _LEN.size + hlen
+            ids = np.frombuffer(plain[off:off + header["ids_len"]], dtype=np.intc)
+            llama_state = plain[off + header["ids_len"]:]
+        except Exception:
+            path.unlink(missing_ok=True)
+            return None
+        if len(llama_state) != header["llama_state_size"]:
+            return None
+        input_ids = np.zeros(llm.n_ctx(), dtype=np.intc)
+        input_ids[:len(ids)] = ids
+        return LlamaState(input_ids=input_ids, scores=self._blank_scores(llm), n_tokens=header["n_tokens"],
+                          llama_state=llama_state, llama_state_size=header["llama_state_size"],
+                          seed=header["seed"])
+
+    @staticmethod
+    def _blank_scores(llm: Llama) -> np.ndarray:
+        return np.zeros((1, llm.n_vocab()), dtype=np.single)
+
+    # --- public ---
+    @staticmethod
+    def resident(llm: Llama, tokens: List[int]) -> bool:
+        n = len(tokens)
+        return llm.n_tokens >= n and list(llm.input_ids[:n]) == tokens
+
+    def prime(self, llm: Llama, prefix: str, fingerprint: Optional[bytes]) -> int:
+        # Makes sure llm's KV cache starts with `prefix`. Returns the number of
+        # prefix tokens that had to be evaluated (0 on any kind of hit).
+        tokens = llm.tokenize(prefix.encode("utf-8"), add_bos=True)
+        if self.resident(llm, tokens):
+            self.hits += 1
+            return 0
+        name = self.cache_key(llm, prefix, fingerprint or b"")
+        with self._lock:
+            state = self._mem.get(name)
+            if state is None:
+                state = self._load(name, llm)
+                if state is not None:
+                    self.disk_hits += 1
+                    self._remember(name, state)
+        if state is not None and list(state.input_ids[:state.n_tokens]) == tokens:
+            try:
+                llm.load_state(state)
+                self.hits += 1
+                return 0
+            except RuntimeError:
+                with self._lock:
+                    self._mem.pop(name, None)
+                self._path(name).unlink(missing_ok=True)
+        self.misses += 1
+        llm.reset()
+        llm.eval(tokens)
+        state = llm.save_state()
+        state.scores = self._blank_scores(llm)
+        with self._lock:
+            self._remember(name, state)
+        if fingerprint:
+            self._store(name, state)
+        return len(tokens)
+
+    def _remember(self, name: str, state: LlamaState):
+        self._mem.pop(name, None)
+        self._mem[name] = state
+        while len(self._mem) > self.max_entries:
+            self._mem.pop(next(iter(self._mem)))
+
+    def clear(self, disk: bool = False):
+        with self._lock:
+            self._mem.clear()
+        if disk and self.cache_dir.exists():
+            for p in self.cache_dir.glob("prefix-*.kv"):
+                p.unlink(missing_ok=True)
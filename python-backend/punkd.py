@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# python-backend/punkd.py
+# PUNKD hazard weighting without re-reading the whole prompt. Tokens come
+# from one precompiled pattern, the static template's counts are computed
+# once per template so a scan only tokenizes its scene lines, the top-k is
+# taken with a heap, and the marker suffix and temperature multiplier are
+# built once per weight set instead of once per chunk. PunkdAnalyzer takes
+# generated text as it arrives; analyze_batch scores a whole route with
+# NumPy. Results match the original full-prompt analysis exactly, ties
+# included (first occurrence wins).
+
+import os
+import re
+import heapq
+from collections import Counter
+from functools import lru_cache
+from operator import itemgetter
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+TOKEN_RE = re.compile(r"[a-zA-Z0-9_]+")
+_TAIL_RE = re.compile(r"[a-zA-Z0-9_]+\Z")
+BOOST = {"ice":2.8,"wet":2.5,"snow":2.9,"fog":2.3,"flood":3.0,"construction":2.2,"debris":2.4,"animal":2.1,"blackice":4.0,"hydroplane":3.5}
+PROFILES = {"conservative": 0.7, "balanced": 1.0, "aggressive": 1.6}
+TOP_N = 16
+MARKERS = 8
+# let generated text move the weights between chunks (off: weights come
+# from the prompt alone, as before)
+ADAPTIVE = os.environ.get("QRS_PUNKD_ADAPTIVE", "0") == "1"
+
+# === COUNTING ===
+def count_tokens(text: str) -> Counter:
+    return Counter(TOKEN_RE.findall(text.lower()))
+
+@lru_cache(maxsize=8)
+def template_counts(template: str) -> Counter:
+    return count_tokens(template)
+
+def _is_word(ch: str) -> bool:
+    return ch.isascii() and (ch.isalnum() or ch == "_")
+
+def _extends(text: str, template: str) -> bool:
+    # `text` starts with `template` and no token straddles the seam
+    return text.startswith(template) and not (
+        len(text) > len(template) and _is_word(template[-1:]) and _is_word(text[len(template)]))
+
+def prompt_counts(text: str, template: Optional[str] = None) -> Counter:
+    # Counts for `text`, reusing the cached counts of a leading `template`.
+    if template and _extends(text, template):
+        freq = template_counts(template).copy()
+        freq.update(TOKEN_RE.findall(text[len(template):].lower()))
+        return freq
+    return count_tokens(text)
+
+def top_weights(freq: Dict[str, int], top_n: int = TOP_N) -> Dict[str, float]:
+    # nlargest is stable like sorted(), so equal scores keep first-seen order.
+    top = heapq.nlargest(top_n, ((t, c * BOOST.get(t, 1.0)) for t, c in freq.items()), key=itemgetter(1))
+    if not top:
+        return {}
+    mx = top[0][1]
+    return {k: float(v / mx) for k, v in top}
+
+def analyze(text: str, top_n: int = TOP_N, template: Optional[str] = None) -> Dict[str, float]:
+    return top_weights(prompt_counts(text, template), top_n)
+
+# === PATCH ===
+def markers(weights: Dict[str, float], profile: str = "balanced") -> Tuple[str, float]:
+    # (suffix appended to a prompt, temperature multiplier)
+    if not weights:
+        return "", 1.0
+    mean = sum(weights.values()) / len(weights)
+    adj = 1.0 + (mean - 0.5) * 1.2 * PROFILES.get(profile, 1.0)
+    adj = max(0.6, min(2.2, adj))
+    top = heapq.nlargest(MARKERS, weights.items(), key=itemgetter(1))
+    return "\n\n[PUNKD HAZARD BOOST] " + " ".join(f"<HAZ:{k}:{v:.2f}>" for k, v in top), adj
+
+def widest_markers(text: str) -> str:
+    # The longest suffix markers() can build from the words of `text`: every
+    # marker on one of its longest words at full weight. Used to size n_ctx.
+    longest = sorted(count_tokens(text), key=len, reverse=True)[:MARKERS]
+    return markers(dict.fromkeys(longest, 1.0))[0]
+
+class PunkdAnalyzer:
+    # Running counts for a prompt plus whatever is fed in afterwards. A word
+    # cut off at the end of a feed is held back until the next one.
+    def __init__(self, text: str = "", template: Optional[str] = None, top_n: int = TOP_N):
+        self.top_n = top_n
+        self.freq = prompt_counts(text, template)
+        self._tail = ""
+        self._weights: Optional[Dict[str, float]] = None
+
+    def feed(self, text: str):
+        text = self._tail + text
+        m = _TAIL_RE.search(text)
+        self._tail = m.group() if m else ""
+        head = text[:m.start()] if m else text
+        if head:
+            self.freq.update(TOKEN_RE.findall(head.lower()))
+        self._weights = None
+
+    def weights(self) -> Dict[str, float]:
+        if self._weights is None:
+            freq = self.freq
+            if self._tail:
+                freq = freq.copy()
+                freq[self._tail.lower()] += 1
+            self._weights = top_weights(freq, self.top_n)
+        return self._weights
+
+class PunkdPatch:
+    # `patch` callable for chunked / streamed generation over an analyzer or
+    # fixed weights. The suffix is only rebuilt when the weights change, i.e.
+    # when generated text is fed in with `adaptive` on.
+    def __init__(self, source: Union[PunkdAnalyzer, Dict[str, float]], profile: str = "balanced",
+                 adaptive: bool = ADAPTIVE):
+        self.analyzer = source if isinstance(source, PunkdAnalyzer) else None
+        self.fixed = None if self.analyzer is not None else source
+        self.profile = profile
+        self.adaptive = adaptive
+        self._weights: Optional[Dict[str, float]] = None
+        self._suffix, self._mult = "", 1.0
+
+    def feed(self, text: str):
+        if self.adaptive and self.analyzer is not None:
+            self.analyzer.feed(text)
+
+    def __call__(self, prompt: str) -> Tuple[str, float]:
+        w = self.analyzer.weights() if self.analyzer is not None else self.fixed
+        if w is not self._weights:
+            self._weights = w
+            self._suffix, self._mult = markers(w, self.profile)
+        return prompt + self._suffix, self._mult
+
+# === BATCH ===
+def analyze_batch(texts: Sequence[str], top_n: int = TOP_N, template: Optional[str] = None) -> List[Dict[str, float]]:
+    # analyze() for many prompts at once: one count matrix over the joint
+    # vocabulary, boosted and ranked row-wise (score desc, first occurrence
+    # asc) with NumPy.
+    import numpy as np
+    if not texts:
+        return []
+    tmpl = template_counts(template) if template else Counter()
+    # template tokens first, in template order: their first occurrence is their rank
+    vocab: Dict[str, int] = {t: i for i, t in enumerate(tmpl)}
+    shared, rows, cols, pos = [], [], [], []
+    for i, text in enumerate(texts):
+        base, rest = 0, text
+        if template and _extends(text, template):
+            shared.append(i)
+            base, rest = len(tmpl), text[len(template):]
+        for j, t in enumerate(TOKEN_RE.findall(rest.lower())):
+            rows.append(i)
+            cols.append(vocab.setdefault(t, len(vocab)))
+            pos.append(base + j)
+    n = len(texts)
+    counts = np.zeros((n, len(vocab)))
+    first = np.full((n, len(vocab)), np.iinfo(np.int64).max, dtype=np.int64)
+    if shared and tmpl:
+        counts[shared, :len(tmpl)] = np.array(list(tmpl.values()), dtype=np.float64)
+        first[shared, :len(tmpl)] = np.arange(len(tmpl))
+    idx = (np.array(rows, dtype=np.intp), np.array(cols, dtype=np.intp))
+    np.add.at(counts, idx, 1.0)
+    np.minimum.at(first, idx, np.array(pos, dtype=np.int64))
+
+    names = list(vocab)
+    boost = np.array([BOOST.get(t, 1.0) for t in names])
+    scores = counts * boost
+    order = np.lexsort((first, -scores), axis=-1)[:, :top_n]
+    out = []
+    for i in range(n):
+        top = [c for c in order[i] if counts[i, c] > 0]
+        if not top:
+            out.append({})
+            continue
+        mx = scores[i, top[0]]
+        out.append({names[c]: float(scores[i, c] / mx) for c in top})
+    return out
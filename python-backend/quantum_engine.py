@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# python-backend/quantum_engine.py
+# NumPy statevector engine for the fixed 2-qubit entropic circuit:
+#   RX(a*pi) q0, RY(b*pi) q1, CNOT(q0 -> q1), RZ(c*pi) q1, RX((a+b+c)*pi/3) q0
+# with <Z0>, <Z1> read out. Scores a whole batch of RGB triples per call.
+# PennyLane is only imported for the "pennylane" cross-check backend.
+
+import math
+from typing import Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+RGB = Tuple[float, float, float]
+
+# Basis order |q0 q1> with q0 as the most significant bit (PennyLane's order).
+_Z0 = np.array([1.0, 1.0, -1.0, -1.0])
+_Z1 = np.array([1.0, -1.0, 1.0, -1.0])
+
+def _rx(theta: np.ndarray) -> np.ndarray:
+    c, s = np.cos(theta / 2), np.sin(theta / 2)
+    m = np.empty(theta.shape + (2, 2), dtype=np.complex128)
+    m[..., 0, 0] = c; m[..., 0, 1] = -1j * s
+    m[..., 1, 0] = -1j * s; m[..., 1, 1] = c
+    return m
+
+def _ry(theta: np.ndarray) -> np.ndarray:
+    c, s = np.cos(theta / 2), np.sin(theta / 2)
+    m = np.empty(theta.shape + (2, 2), dtype=np.complex128)
+    m[..., 0, 0] = c; m[..., 0, 1] = -s
+    m[..., 1, 0] = s; m[..., 1, 1] = c
+    return m
+
+def _rz(theta: np.ndarray) -> np.ndarray:
+    m = np.zeros(theta.shape + (2, 2), dtype=np.complex128)
+    m[..., 0, 0] = np.exp(-0.5j * theta)
+    m[..., 1, 1] = np.exp(0.5j * theta)
+    return m
+
+def _apply_q0(u: np.ndarray, psi: np.ndarray) -> np.ndarray:
+    return np.einsum("nij,njk->nik", u, psi)
+
+def _apply_q1(u: np.ndarray, psi: np.ndarray) -> np.ndarray:
+    return np.einsum("nkj,nij->nik", u, psi)
+
+def _cnot(psi: np.ndarray) -> np.ndarray:
+    out = psi.copy()
+    out[:, 1, :] = psi[:, 1, ::-1]
+    return out
+
+def statevector(rgb: np.ndarray) -> np.ndarray:
+    # rgb: (N, 3) -> (N, 4) final statevectors
+    a, b, c = rgb[:, 0], rgb[:, 1], rgb[:, 2]
+    psi = np.zeros((rgb.shape[0], 2, 2), dtype=np.complex128)
+    psi[:, 0, 0] = 1.0
+    psi = _apply_q0(_rx(a * math.pi), psi)
+    psi = _apply_q1(_ry(b * math.pi), psi)
+    psi = _cnot(psi)
+    psi = _apply_q1(_rz(c * math.pi), psi)
+    psi = _apply_q0(_rx((a + b + c) * math.pi / 3), psi)
+    return psi.reshape(-1, 4)
+
+def circuit_probabilities(rgb: np.ndarray) -> np.ndarray:
+    return np.abs(statevector(rgb)) ** 2
+
+def expvals(rgb: Union[RGB, Sequence[RGB], np.ndarray], shots: Optional[int] = None,
+            rng: Optional[np.random.Generator] = None) -> np.ndarray:
+    # Returns (N, 2) array of <Z0>, <Z1>. shots=None gives exact expectations,
+    # otherwise each row is estimated from `shots` computational-basis samples.
+    arr = np.atleast_2d(np.asarray(rgb, dtype=np.float64))
+    probs = circuit_probabilities(arr)
+    if shots:
+        rng = rng or np.random.default_rng()
+        probs = rng.multinomial(shots, probs / probs.sum(axis=1, keepdims=True)) / shots
+    return np.stack([probs @ _Z0, probs @ _Z1], axis=1)
+
+def scores_from_expvals(ev: np.ndarray) -> np.ndarray:
+    mix = (ev[:, 0] + 1) / 2 * 0.65 + (ev[:, 1] + 1) / 2 * 0.35
+    return 1.0 / (1.0 + np.exp(-9.0 * (mix - 0.5)))
+
+def entropic_scores(rgb: Union[Sequence[RGB], np.ndarray], shots: Optional[int] = None,
+                    rng: Optional[np.random.Generator] = None) -> np.ndarray:
+    return scores_from_expvals(expvals(rgb, shots=shots, rng=rng))
+
+def entropic_score(rgb: RGB, shots: Optional[int] = None, backend: str = "numpy") -> float:
+    if backend == "pennylane":
+        return pennylane_score(rgb, shots=shots)
+    return float(entropic_scores([rgb], shots=shots)[0])
+
+# === PENNYLANE CROSS-CHECK ===
+def pennylane_expvals(rgb: RGB, shots: Optional[int] = None) -> Tuple[float, float]:
+    import pennylane as qml
+    dev = qml.device("default.qubit", wires=2, shots=shots)
+    @qml.qnode(dev)
+    def circuit(a, b, c):
+        qml.RX(a*math.pi, wires=0)
+        qml.RY(b*math.pi, wires=1)
+        qml.CNOT(wires=[0,1])
+        qml.RZ(c*math.pi, wires=1)
+        qml.RX((a+b+c)*math.pi/3, wires=0)
+        return qml.expval(qml.PauliZ(0)), qml.expval(qml.PauliZ(1))
+    e0, e1 = circuit(*rgb)
+    return float(e0), float(e1)
+
+def pennylane_score(rgb: RGB, shots: Optional[int] = None) -> float:
+    return float(scores_from_expvals(np.array([pennylane_expvals(rgb, shots=shots)]))[0])
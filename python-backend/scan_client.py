@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# python-backend/scan_client.py
+# Drop-in for `main.py` argv calls that talks to a running scan_server.py and
+# prints the same JSON line. Falls back to an in-process scan when no server
+# is listening, so callers can switch over unconditionally; a server that is
+# up but slow is not second-guessed (that would scan twice and load a second
+# model here).
+#   scan_client.py            -> READY line
+#   scan_client.py LAT LON    -> scan result
+
+import os
+import sys
+import json
+import socket
+import http.client
+from typing import Dict, Optional
+
+HOST = os.environ.get("QRS_SERVER_HOST", "127.0.0.1")
+PORT = int(os.environ.get("QRS_SERVER_PORT", "8765"))
+SOCKET_PATH = os.environ.get("QRS_SERVER_SOCKET")
+TIMEOUT = float(os.environ.get("QRS_CLIENT_TIMEOUT", "120"))
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path: str, timeout: float):
+        super().__init__("localhost", timeout=timeout)
+        self.unix_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.unix_path)
+
+def _connection(timeout: float = TIMEOUT) -> http.client.HTTPConnection:
+    if SOCKET_PATH:
+        return _UnixHTTPConnection(SOCKET_PATH, timeout)
+    return http.client.HTTPConnection(HOST, PORT, timeout=timeout)
+
+def request(method: str, path: str, body: Optional[Dict[str, object]] = None,
+            timeout: float = TIMEOUT) -> Dict[str, object]:
+    conn = _connection(timeout)
+    try:
+        payload = json.dumps(body).encode() if body is not None else None
+        conn.request(method, path, body=payload, headers={"Content-Type": "application/json"})
+        return json.loads(conn.getresponse().read())
+    finally:
+        conn.close()
+
+def health(timeout: float = 2.0) -> Optional[Dict[str, object]]:
+    try:
+        return request("GET", "/health", timeout=timeout)
+    except (OSError, ValueError, http.client.HTTPException):
+        return None
+
+def scan(lat: float, lon: float, **opts) -> Dict[str, object]:
+    try:
+        return request("POST", "/scan", {"lat": lat, "lon": lon, **opts})
+    except (ConnectionRefusedError, FileNotFoundError):
+        # nothing listening (TCP port or unix socket)
+        import main as backend
+        return backend.run_quantum_scan(lat, lon, **opts)
+    except (socket.timeout, TimeoutError):
+        return {"verdict": "ERROR", "entropy": "scan timed out"}
+    except (OSError, ValueError, http.client.HTTPException) as e:
+        return {"verdict": "ERROR", "entropy": f"server error: {e}"}
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3:
+        try:
+            result = scan(float(sys.argv[1]), float(sys.argv[2]))
+            print(json.dumps({"verdict": result.get("verdict"), "entropy": result.get("entropy")}))
+        except ValueError:
+            print(json.dumps({"verdict": "ERROR", "entropy": "Invalid args"}))
+    else:
+        h = health()
+        print(json.dumps({"verdict": "READY", "entropy": h["entropy"] if h else "QRS Online"}))
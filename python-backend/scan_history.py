@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+# python-backend/scan_history.py
+# Encrypted scan-history store. Rows are sealed one by one with AES-GCM under
+# a key derived from the app key, so a write never re-encrypts the database.
+# Only the timestamp and an HMAC of the row's geohash cell stay in clear text;
+# both are indexed, so "recent" and "near a point" queries never decrypt
+# rows outside the result. Writes are buffered and flushed in batches by an
+# event loop running on its own thread (WAL mode, one transaction per batch).
+
+import os
+import json
+import time
+import hmac
+import asyncio
+import struct
+import hashlib
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Deque, Dict, List, Optional, Tuple
+
+import aiosqlite
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+from geohash import cells_covering, covering_size, geohash_encode, haversine_m
+
+FLUSH_INTERVAL = float(os.environ.get("QRS_HISTORY_FLUSH", "2.0"))
+FLUSH_BATCH = int(os.environ.get("QRS_HISTORY_BATCH", "32"))
+NONCE_SIZE = 12
+# more cells than this (near the poles) and near() walks rows by time instead
+MAX_NEAR_CELLS = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scans (
+    id      INTEGER PRIMARY KEY,
+    ts      REAL NOT NULL,
+    cell    BLOB NOT NULL,
+    payload BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_scans_ts ON scans(ts);
+CREATE INDEX IF NOT EXISTS idx_scans_cell_ts ON scans(cell, ts);
+"""
+
+# the AAD binds a row to its stored REAL, byte for byte
+def _ts_bytes(ts: float) -> bytes:
+    return struct.pack(">d", ts)
+
+# === STORE ===
+class ScanHistory:
+    def __init__(self, path: Path, key: bytes, flush_interval: float = FLUSH_INTERVAL, batch_size: int = FLUSH_BATCH):
+        self.path = Path(path)
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._aes = AESGCM(self._derive(key, b"qrs-history-enc"))
+        self._mac_key = self._derive(key, b"qrs-history-cell")
+        self._buf: Deque[Tuple[float, bytes, bytes]] = deque()
+        self._db: Optional[aiosqlite.Connection] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self._closing = False
+        self.written = 0
+
+    @staticmethod
+    def _derive(key: bytes, info: bytes) -> bytes:
+        return HKDF(algorithm=hashes.SHA256(), length=32, salt=None, info=info).derive(key)
+
+    def _cell(self, lat: float, lon: float) -> bytes:
+        return self._cell_for(geohash_encode(lat, lon))
+
+    def _cell_for(self, geohash: str) -> bytes:
+        return hmac.new(self._mac_key, geohash.encode(), hashlib.sha256).digest()[:16]
+
+    def _seal(self, ts: float, cell: bytes, record: Dict[str, object]) -> bytes:
+        nonce = os.urandom(NONCE_SIZE)
+        aad = _ts_bytes(ts) + cell
+        return nonce + self._aes.encrypt(nonce, json.dumps(record, separators=(",", ":")).encode(), aad)
+
+    def _open(self, ts: float, cell: bytes, payload: bytes) -> Optional[Dict[str, object]]:
+        try:
+            plain = self._aes.decrypt(payload[:NONCE_SIZE], payload[NONCE_SIZE:], _ts_bytes(ts) + cell)
+        except Exception:
+            return None
+        return json.loads(plain)
+
+    # --- lifecycle (runs its own loop so sync callers on any thread can use it) ---
+    def start(self) -> "ScanHistory":
+        if self._thread is not None:
+            return self
+        ready = threading.Event()
+        errors: List[BaseException] = []
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            try:
+                self._loop.run_until_complete(self._open_db())
+            except BaseException as e:
+                errors.append(e)
+                ready.set()
+                return
+            ready.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, name="qrs-history", daemon=True)
+        self._thread.start()
+        ready.wait()
+        if errors:
+            self._thread = None
+            raise errors[0]
+        return self
+
+    async def _open_db(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = await aiosqlite.connect(str(self.path))
+        await self._db.execute("PRAGMA journal_mode=WAL")
+        await self._db.execute("PRAGMA synchronous=NORMAL")
+        await self._db.executescript(SCHEMA)
+        await self._db.commit()
+        self._wake = asyncio.Event()
+        self._closing = False
+        self._flusher = asyncio.create_task(self._flush_loop())
+
+    def _call(self, coro, timeout: Optional[float] = 30.0):
+        self.start()
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result(timeout)
+
+    def close(self):
+        if self._thread is None:
+            return
+        self._call(self._close())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        self._thread = None
+
+    async def _close(self):
+        # let the flusher finish the batch it may be writing, then drain the rest
+        self._closing = True
+        if self._flusher is not None:
+            self._wake.set()
+            await self._flusher
+        await self._flush()
+        await self._db.close()
+
+    # --- write-behind ---
+    def record(self, lat: float, lon: float, result: Dict[str, object], metrics: Optional[Dict[str, float]] = None,
+               score: Optional[float] = None, timings: Optional[Dict[str, object]] = None, ts: Optional[float] = None):
+        # Thread-safe and non-blocking: sealing happens here, the insert is
+        # batched by the flusher.
+        ts = time.time() if ts is None else float(ts)  # sealed and stored as the same REAL
+        cell = self._cell(lat, lon)
+        rec = {"ts": ts, "lat": lat, "lon": lon, "verdict": result.get("verdict"), "entropy": result.get("entropy"),
+               "score": score, "metrics": metrics, "timings": timings}
+        for k in ("probabilities", "cached", "tier"):
+            if k in result:
+                rec[k] = result[k]
+        self._buf.append((ts, cell, self._seal(ts, cell, rec)))
+        if self._loop is not None and len(self._buf) >= self.batch_size:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    async def _flush_loop(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self._flush()
+
+    async def _flush(self):
+        while self._buf:
+            batch = []
+            while self._buf and len(batch) < self.batch_size * 4:
+                batch.append(self._buf.popleft())
+            await self._db.executemany("INSERT INTO scans (ts, cell, payload) VALUES (?, ?, ?)", batch)
+            await self._db.commit()
+            self.written += len(batch)
+
+    def flush(self):
+        self._call(self._flush())
+
+    # --- queries ---
+    async def _recent(self, limit: int, since: Optional[float]) -> List[Dict[str, object]]:
+        await self._flush()
+        q = "SELECT ts, cell, payload FROM scans"
+        args: Tuple = ()
+        if since is not None:
+            q += " WHERE ts >= ?"
+            args = (since,)
+        q += " ORDER BY ts DESC LIMIT ?"
+        async with self._db.execute(q, args + (limit,)) as cur:
+            rows = await cur.fetchall()
+        return [r for r in (self._open(*row) for row in rows) if r is not None]
+
+    async def _near(self, lat: float, lon: float, radius_m: float, limit: int,
+                    since: Optional[float]) -> List[Dict[str, object]]:
+        await self._flush()
+        # lat/lon are sealed, so past MAX_NEAR_CELLS this decrypts rows
+        # newest first instead of binding an ever longer IN (...) list
+        if covering_size(lat, lon, radius_m) > MAX_NEAR_CELLS:
+            q, args = "SELECT ts, cell, payload FROM scans WHERE 1", ()
+        else:
+            cells = [self._cell_for(g) for g in cells_covering(lat, lon, radius_m)]
+            q = f"SELECT ts, cell, payload FROM scans WHERE cell IN ({','.join('?' * len(cells))})"
+            args = tuple(cells)
+        if since is not None:
+            q += " AND ts >= ?"
+            args += (since,)
+        q += " ORDER BY ts DESC"
+        out = []
+        async with self._db.execute(q, args) as cur:
+            async for row in cur:
+                rec = self._open(*row)
+                if rec is None:
+                    continue
+                d = haversine_m(lat, lon, rec["lat"], rec["lon"])
+                if d <= radius_m:
+                    rec["distance_m"] = round(d, 1)
+                    out.append(rec)
+                    if len(out) >= limit:
+                        break
+        return out
+
+    def recent(self, limit: int = 50, since: Optional[float] = None) -> List[Dict[str, object]]:
+        return self._call(self._recent(limit, since))
+
+    def near(self, lat: float, lon: float, radius_m: float = 250.0, limit: int = 50,
+             since: Optional[float] = None) -> List[Dict[str, object]]:
+        return self._call(self._near(lat, lon, radius_m, limit, since))
+
+    def __len__(self) -> int:
+        async def count():
+            await self._flush()
+            async with self._db.execute("SELECT COUNT(*) FROM scans") as cur:
+                return (await cur.fetchone())[0]
+        return self._call(count())
+
+_HISTORY: Optional[ScanHistory] = None
+
+def open_history(path: Path, key: bytes) -> ScanHistory:
+    global _HISTORY
+    if _HISTORY is None or _HISTORY.path != Path(path):
+        _HISTORY = ScanHistory(path, key).start()
+    return _HISTORY
+
+def get_history() -> Optional[ScanHistory]:
+    return _HISTORY
+
+async def init_db(key: bytes, path: Path = Path("scan_history.db")) -> ScanHistory:
+    # Opens (and creates) the store without blocking the caller's loop.
+    return await asyncio.get_running_loop().run_in_executor(None, open_history, path, key)
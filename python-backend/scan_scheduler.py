@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# python-backend/scan_scheduler.py
+# Single-flight scheduling for GPS-driven scans. At most one scan runs at a
+# time; fixes that arrive meanwhile overwrite a single "latest pending" slot
+# instead of queueing, fixes too close (in metres and seconds) to the last
+# scanned one are skipped, and the running scan is told to stop once a newer
+# fix could start in its place: the minimum interval is up and the fix has
+# moved at least min_distance_m from the one being scanned (or was forced).
+
+import os
+import time
+import threading
+from typing import Callable, Dict, Optional, Tuple
+
+from geohash import haversine_m
+
+MIN_DISTANCE_M = float(os.environ.get("QRS_SCAN_MIN_DISTANCE", "25"))
+MIN_INTERVAL_S = float(os.environ.get("QRS_SCAN_MIN_INTERVAL", "5"))
+# a stationary device is rescanned after this long anyway
+REFRESH_S = float(os.environ.get("QRS_SCAN_REFRESH", "60"))
+
+# run(lat, lon, should_stop) -> result; should_stop() turns True once the
+# scan is stale. on_result gets (lat, lon, result) for scans that finished
+# without being superseded.
+ScanFn = Callable[[float, float, Callable[[], bool]], object]
+ResultFn = Callable[[float, float, object], None]
+
+class ScanScheduler:
+    def __init__(self, run: ScanFn, on_result: Optional[ResultFn] = None, min_distance_m: float = MIN_DISTANCE_M,
+                 min_interval_s: float = MIN_INTERVAL_S, refresh_s: float = REFRESH_S):
+        self.run = run
+        self.on_result = on_result
+        self.min_distance_m = min_distance_m
+        self.min_interval_s = min_interval_s
+        self.refresh_s = refresh_s
+        self._cond = threading.Condition()
+        self._pending: Optional[Tuple[float, float, bool]] = None  # lat, lon, forced
+        self._last: Optional[Tuple[float, float, float]] = None  # lat, lon, start time of the last scan
+        self._gen = 0          # bumped per fix handed to the worker
+        self._running = False
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+        self.stats = {"fixes": 0, "skipped": 0, "coalesced": 0, "started": 0, "cancelled": 0, "completed": 0,
+                      "errors": 0}
+
+    # --- intake ---
+    def _is_near_last(self, lat: float, lon: float, now: float) -> bool:
+        if self._last is None:
+            return False
+        last_lat, last_lon, last_t = self._last
+        if now - last_t >= self.refresh_s:
+            return False
+        return haversine_m(last_lat, last_lon, lat, lon) < self.min_distance_m
+
+    def submit(self, lat: float, lon: float, force: bool = False) -> bool:
+        # Returns False when the fix was skipped as too close to the last scan.
+        with self._cond:
+            self.stats["fixes"] += 1
+            if not force and self._is_near_last(lat, lon, time.monotonic()):
+                self.stats["skipped"] += 1
+                return False
+            if self._pending is not None:
+                self.stats["coalesced"] += 1
+            self._pending = (lat, lon, force)
+            self._ensure_thread()
+            self._cond.notify_all()
+            return True
+
+    def _ensure_thread(self):
+        # A loop still finishing its scan after close() is reused, never
+        # doubled: it clears _thread (under the lock) only once it is out of
+        # scans for good.
+        self._closed = False
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._loop, name="qrs-scan-scheduler", daemon=True)
+            self._thread.start()
+
+    def _superseded(self, lat: float, lon: float, started: float) -> bool:
+        pending = self._pending
+        if pending is None or time.monotonic() - started < self.min_interval_s:
+            return False
+        p_lat, p_lon, forced = pending
+        return forced or haversine_m(lat, lon, p_lat, p_lon) >= self.min_distance_m
+
+    # --- worker ---
+    def _next(self) -> Optional[Tuple[float, float, float]]:
+        with self._cond:
+            while not self._closed:
+                if self._pending is None:
+                    self._cond.wait()
+                    continue
+                # hold the latest fix back until the minimum interval has passed
+                wait = 0.0 if self._last is None else self._last[2] + self.min_interval_s - time.monotonic()
+                if wait > 0:
+                    self._cond.wait(wait)
+                    continue
+                lat, lon, _ = self._pending
+                self._pending = None
+                self._last = (lat, lon, time.monotonic())
+                self._gen += 1
+                self._running = True
+                return self._last
+            self._thread = None
+            return None
+
+    def _loop(self):
+        while True:
+            job = self._next()
+            if job is None:
+                return
+            lat, lon, started = job
+            stopped = False
+
+            def should_stop() -> bool:
+                # latches: a scan told to stop stays stale even if it finishes
+                nonlocal stopped
+                stopped = stopped or self._closed or self._superseded(lat, lon, started)
+                return stopped
+
+            self.stats["started"] += 1
+            result, failed = None, False
+            try:
+                result = self.run(lat, lon, should_stop)
+            except Exception:
+                failed = True
+            with self._cond:
+                self._running = False
+                stale = stopped or self._closed
+                self.stats["errors" if failed else "cancelled" if stale else "completed"] += 1
+            if not (stale or failed) and self.on_result is not None:
+                self.on_result(lat, lon, result)
+
+    # --- state ---
+    @property
+    def busy(self) -> bool:
+        with self._cond:
+            return self._running or self._pending is not None
+
+    def close(self, timeout: Optional[float] = 5.0):
+        with self._cond:
+            self._closed = True
+            self._pending = None
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def snapshot(self) -> Dict[str, object]:
+        with self._cond:
+            return {**self.stats, "busy": self._running or self._pending is not None, "generation": self._gen}
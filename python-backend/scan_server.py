@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# python-backend/scan_server.py
+# Long-running scan server so callers stop paying an interpreter start, the
+# imports and a model load per scan. Speaks a minimal HTTP/1.1 over localhost
+# TCP or a Unix socket:
+#   GET  /health  -> READY line (same shape as `main.py` with no args)
+#   POST /scan    {"lat", "lon", "mode"?, "timings"?} -> run_quantum_scan result
+# Requests go through a bounded queue in front of a single inference thread
+# (or, with --workers N, a pool of N model processes; see worker_pool.py);
+# requests whose coordinates round to the same cell share one inference.
+
+import os
+import sys
+import json
+import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import main as backend
+from worker_pool import WORKERS, WorkerPool
+
+HOST = os.environ.get("QRS_SERVER_HOST", "127.0.0.1")
+PORT = int(os.environ.get("QRS_SERVER_PORT", "8765"))
+SOCKET_PATH = os.environ.get("QRS_SERVER_SOCKET")
+QUEUE_SIZE = int(os.environ.get("QRS_SERVER_QUEUE", "8"))
+# decimal places coordinates are rounded to before coalescing (4 ~ 11 m)
+COALESCE_DECIMALS = int(os.environ.get("QRS_COALESCE_DECIMALS", "4"))
+MAX_BODY = 1 << 20
+
+ScanKey = Tuple[float, float, str, bool]
+
+class ScanServer:
+    def __init__(self, queue_size: int = QUEUE_SIZE, coalesce_decimals: int = COALESCE_DECIMALS,
+                 workers: int = WORKERS):
+        # (coalescing key, first requester's lat/lon, future)
+        self.queue: "asyncio.Queue[Tuple[ScanKey, Tuple[float, float], asyncio.Future]]" = asyncio.Queue(maxsize=queue_size)
+        self.coalesce_decimals = coalesce_decimals
+        self.pending: Dict[ScanKey, asyncio.Future] = {}
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="qrs-infer")
+        self.stats = {"requests": 0, "coalesced": 0, "rejected": 0, "completed": 0, "errors": 0}
+        self.pool = WorkerPool(workers) if workers > 1 else None
+        self.ready = False
+        self._workers: List[asyncio.Task] = []
+        self._pool_started: Optional[asyncio.Future] = None
+
+    # --- inference ---
+    def key_for(self, lat: float, lon: float, mode: str, timings: bool) -> ScanKey:
+        d = self.coalesce_decimals
+        return (round(lat, d), round(lon, d), mode, timings)
+
+    async def start(self, warm: bool = True):
+        loop = asyncio.get_running_loop()
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self.pool.workers if self.pool else 1)]
+        await loop.run_in_executor(None, backend.enable_history)
+        if self.pool is not None:
+            # workers always warm as they start; scans wait for the pool
+            self._pool_started = loop.run_in_executor(None, self.pool.start)
+            self._pool_started.add_done_callback(self._warmed)
+        elif warm:
+            # warms on the inference thread without holding up READY; scans
+            # queued meanwhile simply run after it
+            warming = loop.run_in_executor(self.executor, backend.warm_model)
+            warming.add_done_callback(self._warmed)
+
+    def _warmed(self, fut: asyncio.Future):
+        self.ready = self.ready or (fut.exception() is None and bool(fut.result()))
+
+    async def _infer(self, lat: float, lon: float, mode: str, timings: bool) -> Dict[str, object]:
+        if self._pool_started is not None:
+            try:
+                pooled = await self._pool_started
+            except Exception:
+                pooled = False  # fall back to in-process inference
+            if pooled:
+                return await asyncio.wrap_future(self.pool.submit(lat, lon, mode, timings))
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, backend.run_quantum_scan, lat, lon, mode, timings)
+
+    async def _work(self):
+        while True:
+            key, (lat, lon), fut = await self.queue.get()
+            _, _, mode, timings = key
+            result: Dict[str, object] = {"verdict": "ERROR", "entropy": "scan failed"}
+            try:
+                result = await self._infer(lat, lon, mode, timings)
+                self.ready = self.ready or result.get("verdict") != "ERROR"
+                if not fut.done():
+                    fut.set_result(result)
+            except Exception as e:
+                result = {"verdict": "ERROR", "entropy": str(e)}
+                if not fut.done():
+                    fut.set_result(result)
+            finally:
+                self.pending.pop(key, None)
+                self.stats["errors" if result.get("verdict") == "ERROR" else "completed"] += 1
+                self.queue.task_done()
+
+    async def scan(self, lat: float, lon: float, mode: str = backend.SCAN_MODE,
+                   timings: bool = False) -> Optional[Dict[str, object]]:
+        # Returns None when the queue is full.
+        self.stats["requests"] += 1
+        key = self.key_for(lat, lon, mode, timings)
+        fut = self.pending.get(key)
+        if fut is not None:
+            self.stats["coalesced"] += 1
+            return dict(await asyncio.shield(fut))
+        fut = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((key, (lat, lon), fut))
+        except asyncio.QueueFull:
+            self.stats["rejected"] += 1
+            return None
+        self.pending[key] = fut
+        return dict(await asyncio.shield(fut))
+
+    def _resident(self) -> bool:
+        if self.pool is not None and self.pool.running:
+            return self.ready
+        return backend.MODEL_MANAGER.loaded
+
+    def health(self) -> Dict[str, object]:
+        return {"verdict": "READY",
+                "entropy": "QRS Online (model resident)" if self._resident() else "QRS Online",
+                "queued": self.queue.qsize(), "workers": self.pool.workers if self.pool else 1, **self.stats,
+                "cache": dict(backend.VERDICT_CACHE.stats) if backend.VERDICT_CACHE is not None else None,
+                "cascade": backend.CASCADE.snapshot() if backend.CASCADE is not None else None}
+
+    def close(self):
+        for t in self._workers:
+            t.cancel()
+        if self.pool is not None:
+            self.pool.close()
+        self.executor.shutdown(wait=False)
+
+    # --- HTTP ---
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            status, body = await self._dispatch(reader)
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError, KeyError, TypeError) as e:
+            status, body = 400, {"verdict": "ERROR", "entropy": f"Bad request: {e}"}
+        payload = json.dumps(body).encode()
+        reason = {200: "OK", 400: "Bad Request", 404: "Not Found", 503: "Service Unavailable"}.get(status, "OK")
+        try:
+            writer.write(f"HTTP/1.1 {status} {reason}\r\nContent-Type: application/json\r\n"
+                         f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode() + payload)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, reader: asyncio.StreamReader) -> Tuple[int, Dict[str, object]]:
+        request_line = (await reader.readline()).decode("latin-1").strip()
+        if not request_line:
+            raise ValueError("empty request")
+        method, path = request_line.split(" ")[:2]
+        length = 0
+        while True:
+            line = (await reader.readline()).decode("latin-1").strip()
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            if name.strip().lower() == "content-length":
+                length = int(value.strip())
+        if length > MAX_BODY:
+            raise ValueError("body too large")
+        raw = await reader.readexactly(length) if length else b""
+
+        if path == "/health":
+            return 200, self.health()
+        if path == "/scan" and method == "POST":
+            req = json.loads(raw or b"{}")
+            result = await self.scan(float(req["lat"]), float(req["lon"]), str(req.get("mode", backend.SCAN_MODE)),
+                                     bool(req.get("timings", False)))
+            if result is None:
+                return 503, {"verdict": "ERROR", "entropy": "BUSY"}
+            return 200, result
+        return 404, {"verdict": "ERROR", "entropy": f"No route {method} {path}"}
+
+async def serve(host: str = HOST, port: int = PORT, socket_path: Optional[str] = SOCKET_PATH,
+                queue_size: int = QUEUE_SIZE, warm: bool = True, workers: int = WORKERS):
+    server = ScanServer(queue_size, workers=workers)
+    if socket_path:
+        Path(socket_path).unlink(missing_ok=True)
+        srv = await asyncio.start_unix_server(server.handle, path=socket_path)
+        where = socket_path
+    else:
+        srv = await asyncio.start_server(server.handle, host, port)
+        where = f"{host}:{port}"
+    await server.start(warm=warm)
+    print(json.dumps({"verdict": "READY", "entropy": f"QRS server on {where}"}), flush=True)
+    try:
+        async with srv:
+            await srv.serve_forever()
+    finally:
+        server.close()
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="QRS scan server")
+    ap.add_argument("--host", default=HOST)
+    ap.add_argument("--port", type=int, default=PORT)
+    ap.add_argument("--unix", default=SOCKET_PATH, help="serve on a Unix socket instead of TCP")
+    ap.add_argument("--queue", type=int, default=QUEUE_SIZE)
+    ap.add_argument("--no-warm", action="store_true")
+    ap.add_argument("--workers", type=int, default=WORKERS, help="model worker processes (1 = in-process)")
+    args = ap.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.unix, args.queue, warm=not args.no_warm, workers=args.workers))
+    except KeyboardInterrupt:
+        sys.exit(0)
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# python-backend/scan_trace.py
+# Per-stage timing for a scan. A ScanTrace is made current with `tracing()`;
+# pipeline code records into `current_trace()`, which is a shared no-op
+# object unless a trace is active, so disabled instrumentation costs one
+# ContextVar lookup per stage. Finished traces can be appended to a JSONL
+# file with size-based rotation.
+
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Dict, List, Optional
+
+TRACE_PATH = os.environ.get("QRS_TRACE_PATH")
+TRACE_MAX_BYTES = int(os.environ.get("QRS_TRACE_MAX_BYTES", str(4 << 20)))
+TRACE_BACKUPS = int(os.environ.get("QRS_TRACE_BACKUPS", "3"))
+
+class ScanTrace:
+    enabled = True
+
+    def __init__(self, **meta):
+        self.meta = meta
+        self.stages: List[Dict[str, object]] = []
+        self._t0 = time.perf_counter()
+        self.wall_start = time.time()
+
+    @contextmanager
+    def stage(self, name: str, **fields):
+        rec = {"name": name, **fields}
+        t = time.perf_counter()
+        try:
+            yield rec
+        finally:
+            rec["ms"] = round((time.perf_counter() - t) * 1000.0, 3)
+            self.stages.append(rec)
+
+    def record(self, name: str, seconds: float, **fields):
+        self.stages.append({"name": name, "ms": round(seconds * 1000.0, 3), **fields})
+
+    def total_ms(self) -> float:
+        return round((time.perf_counter() - self._t0) * 1000.0, 3)
+
+    def to_dict(self) -> Dict[str, object]:
+        return {"total_ms": self.total_ms(), "stages": list(self.stages)}
+
+class _NullTrace:
+    enabled = False
+
+    def stage(self, name: str, **fields):
+        return nullcontext({})
+
+    def record(self, name: str, seconds: float, **fields):
+        pass
+
+NULL_TRACE = _NullTrace()
+_CURRENT: ContextVar = ContextVar("qrs_scan_trace", default=NULL_TRACE)
+
+def current_trace():
+    return _CURRENT.get()
+
+@contextmanager
+def tracing(enabled: bool, **meta):
+    if not enabled:
+        yield NULL_TRACE
+        return
+    trace = ScanTrace(**meta)
+    token = _CURRENT.set(trace)
+    try:
+        yield trace
+    finally:
+        _CURRENT.reset(token)
+
+# === JSONL TRACE LOG ===
+class TraceLog:
+    def __init__(self, path: Path, max_bytes: int = TRACE_MAX_BYTES, backups: int = TRACE_BACKUPS):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._lock = threading.Lock()
+
+    def _rotate(self):
+        for i in range(self.backups - 1, 0, -1):
+            src = self.path.with_name(f"{self.path.name}.{i}")
+            if src.exists():
+                os.replace(src, self.path.with_name(f"{self.path.name}.{i + 1}"))
+        if self.backups > 0:
+            os.replace(self.path, self.path.with_name(f"{self.path.name}.1"))
+        else:
+            self.path.unlink()
+
+    def append(self, record: Dict[str, object]):
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+        with self._lock:
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                if self.path.exists() and self.path.stat().st_size + len(line) > self.max_bytes:
+                    self._rotate()
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(line)
+            except OSError:
+                pass
+
+TRACE_LOG: Optional[TraceLog] = TraceLog(Path(TRACE_PATH)) if TRACE_PATH else None
+
+def log_trace(trace: ScanTrace, **result):
+    if TRACE_LOG is None or not trace.enabled:
+        return
+    TRACE_LOG.append({"ts": trace.wall_start, **trace.meta, **trace.to_dict(), **result})
@@ -0,0 +1,7 @@
+# python-backend/tests/conftest.py
+# The backend modules are flat scripts; make them importable from the tests.
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,55 @@
+# python-backend/tests/test_embedded_worker.py
+
+import json
+import os
+import threading
+
+import pytest
+
+from embedded_worker import WorkerClient
+
+def make_client():
+    # a client wired to pipes this test plays the worker on
+    ev_r, ev_w = os.pipe()
+    req_r, req_w = os.pipe()
+    client = WorkerClient(os.fdopen(ev_r, "r"), os.fdopen(req_w, "w", buffering=1))
+    return client, os.fdopen(ev_w, "w", buffering=1), os.fdopen(req_r, "r")
+
+def test_pending_warm_is_answered_when_the_worker_exits():
+    client, events, requests = make_client()
+    got = []
+    t = threading.Thread(target=lambda: got.append(client.warm(timeout=5)))
+    t.start()
+    json.loads(requests.readline())  # the warm request went out
+    events.close()
+    t.join(5)
+    assert got and got[0]["entropy"] == "worker exited"
+    with pytest.raises(RuntimeError):
+        client.warm(timeout=1)
+    requests.close()
+
+def test_warm_times_out_and_forgets_the_request():
+    client, events, requests = make_client()
+    res = client.warm(timeout=0.1)
+    assert res["ok"] is False and "timed out" in res["error"]
+    assert client._pending == {}
+    rid = json.loads(requests.readline())["id"]
+    events.write(json.dumps({"id": rid, "done": True, "ok": True}) + "\n")  # a late answer is dropped
+    events.close()
+    client.ready.wait(5)
+    requests.close()
+
+def test_scan_events_are_routed_to_their_request():
+    client, events, requests = make_client()
+
+    def worker():
+        req = json.loads(requests.readline())
+        events.write(json.dumps({"id": req["id"], "token": "Lo", "token_id": 7}) + "\n")
+        events.write(json.dumps({"id": req["id"], "done": True, "verdict": "Low"}) + "\n")
+
+    threading.Thread(target=worker).start()
+    evs = list(client.scan(1.0, 2.0))
+    assert evs == [{"token": "Lo", "token_id": 7}, {"done": True, "verdict": "Low"}]
+    assert client._pending == {}
+    events.close()
+    requests.close()
@@ -0,0 +1,36 @@
+# python-backend/tests/test_geohash.py
+
+import time
+
+import pytest
+
+from geohash import cell_size_deg, cells_covering, covering_size, geohash_encode
+from verdict_cache import VerdictCache
+
+METRICS = {"cpu": 0.2, "mem": 0.3, "load1": 0.1, "temp": 0.4, "proc": 0.2}
+
+@pytest.mark.parametrize("lat", [90.0, -90.0, 89.99999, -89.99999])
+def test_polar_cover_is_capped_at_one_band(lat):
+    _, dlon_cell = cell_size_deg(7)
+    band = int(round(360.0 / dlon_cell))
+    assert covering_size(lat, 12.0, 150.0, 7) <= 2 * band
+    cells = cells_covering(lat, 12.0, 150.0, 4)
+    assert geohash_encode(lat, 12.0, 4) in cells
+    assert geohash_encode(lat, -168.0, 4) in cells  # across the pole
+    assert len(cells) <= 2 * int(round(360.0 / cell_size_deg(4)[1]))
+
+def test_cover_contains_the_point_and_its_neighbours():
+    cells = cells_covering(45.0, 179.9999, 150.0, 7)
+    assert geohash_encode(45.0, 179.9999, 7) in cells
+    assert geohash_encode(45.0, -179.9999, 7) in cells  # wraps the antimeridian
+    assert len(cells) < 30
+
+@pytest.mark.parametrize("lat", [90.0, -90.0, 89.99])
+def test_polar_cache_lookup_is_fast(lat):
+    cache = VerdictCache(precision=7)
+    key = cache.scene_key(lat, 0.0, METRICS, 0.5, "STABLE", "generate")
+    cache.put(key, lat, 0.0, {"verdict": "Low"})
+    t0 = time.perf_counter()
+    _, hit = cache.lookup(lat, 180.0 if abs(lat) == 90.0 else 0.0005, METRICS, 0.5, "STABLE", "generate")
+    assert time.perf_counter() - t0 < 0.1
+    assert hit is not None and hit["verdict"] == "Low"
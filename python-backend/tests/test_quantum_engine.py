@@ -0,0 +1,29 @@
+# python-backend/tests/test_quantum_engine.py
+
+import numpy as np
+import pytest
+
+import quantum_engine as qe
+
+pytest.importorskip("pennylane")
+
+RGB = np.random.default_rng(1234).uniform(0.0, 1.0, size=(16, 3))
+EDGES = np.array([[0.0, 0.0, 0.0], [1.0, 1.0, 1.0], [1.0, 0.0, 0.5], [0.5, 1.0, 0.0]])
+
+@pytest.mark.parametrize("rgb", list(np.vstack([RGB, EDGES])), ids=lambda r: "{:.2f},{:.2f},{:.2f}".format(*r))
+def test_expvals_match_pennylane(rgb):
+    ours = qe.expvals(tuple(rgb))[0]
+    theirs = qe.pennylane_expvals(tuple(rgb))
+    np.testing.assert_allclose(ours, theirs, atol=1e-9)
+
+def test_batch_scores_match_pennylane():
+    ours = qe.entropic_scores(RGB)
+    theirs = [qe.pennylane_score(tuple(rgb)) for rgb in RGB]
+    np.testing.assert_allclose(ours, theirs, atol=1e-9)
+    for rgb, score in zip(RGB, ours):
+        assert qe.entropic_score(tuple(rgb), backend="pennylane") == pytest.approx(score, abs=1e-9)
+
+def test_sampled_expvals_converge_on_exact():
+    rng = np.random.default_rng(7)
+    sampled = qe.expvals(RGB, shots=20000, rng=rng)
+    np.testing.assert_allclose(sampled, qe.expvals(RGB), atol=0.05)
@@ -0,0 +1,51 @@
+# python-backend/tests/test_scan_scheduler.py
+
+import threading
+import time
+
+from scan_scheduler import ScanScheduler
+
+def test_submit_after_timed_out_close_keeps_single_flight():
+    release = threading.Event()
+    lock = threading.Lock()
+    running, peak, done = [0], [0], []
+
+    def run(lat, lon, should_stop):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        release.wait(5)  # a scan that ignores should_stop
+        with lock:
+            running[0] -= 1
+        done.append((lat, lon))
+
+    sched = ScanScheduler(run, min_distance_m=0, min_interval_s=0)
+    sched.submit(1.0, 1.0)
+    while not running[0]:
+        time.sleep(0.01)
+    sched.close(timeout=0.05)  # the scan is still running
+    sched.submit(2.0, 2.0)
+    time.sleep(0.1)
+    assert peak[0] == 1
+    release.set()
+    deadline = time.monotonic() + 5
+    while (2.0, 2.0) not in done and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert done == [(1.0, 1.0), (2.0, 2.0)]
+    assert peak[0] == 1
+    sched.close()
+
+def test_scan_is_not_cancelled_before_the_newer_fix_is_due():
+    stopped = []
+
+    def run(lat, lon, should_stop):
+        time.sleep(0.1)
+        stopped.append(should_stop())
+
+    sched = ScanScheduler(run, min_distance_m=0, min_interval_s=10)
+    sched.submit(1.0, 1.0)
+    time.sleep(0.02)
+    sched.submit(1.1, 1.1)  # held back by the interval
+    time.sleep(0.2)
+    assert stopped == [False]
+    sched.close(timeout=0.1)
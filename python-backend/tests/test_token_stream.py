@@ -0,0 +1,37 @@
+# python-backend/tests/test_token_stream.py
+
+import pytest
+
+from token_stream import OVERLAP_WINDOW, _OverlapFilter
+
+def run(tail, chunk, flush=True):
+    f = _OverlapFilter(tail)
+    out = [t for tok in chunk for t in f.feed(tok)]
+    return out + f.flush() if flush else out
+
+@pytest.mark.parametrize("tail, chunk, expected", [
+    ([5, 3, 3], [3, 3, 4], [4]),                  # longest repeat wins over the one-token one
+    ([3, 3, 3], [3, 3, 3, 4], [4]),
+    ([3, 3, 3], [3, 3, 4], [4]),
+    ([7, 3, 3, 3], [3, 3, 3, 3, 4], [3, 4]),      # only the tail's length can repeat
+    ([1, 2, 3], [2, 3, 9], [9]),
+    ([1, 2, 3], [2, 5], [2, 5]),                  # diverges before the end of the tail
+    ([1, 2, 3], [4, 5], [4, 5]),
+    ([], [1, 2], [1, 2]),
+])
+def test_overlap_is_dropped(tail, chunk, expected):
+    assert run(tail, chunk) == expected
+
+def test_tokens_after_the_repeat_pass_straight_through():
+    f = _OverlapFilter([5, 3, 3])
+    assert [f.feed(t) for t in (3, 3, 4, 3)] == [[], [], [4], [3]]
+
+def test_flush_drops_a_completed_repeat_still_held():
+    # [3] already repeats the tail; [3, 3] might still follow when the chunk ends
+    assert run([5, 3, 3], [3]) == []
+    assert run([5, 3, 3], [3], flush=False) == []
+
+def test_only_the_window_is_compared():
+    tail = list(range(100))
+    assert run(tail, tail[-OVERLAP_WINDOW:] + [7]) == [7]
+    assert run(tail, tail[-OVERLAP_WINDOW - 1:] + [7]) == tail[-OVERLAP_WINDOW - 1:] + [7]
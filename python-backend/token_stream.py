@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# python-backend/token_stream.py
+# Token-level streaming for the road scanner. Built on Llama.generate (the
+# token-id generator under llama-cpp's stream=True), so every token is
+# surfaced as soon as it is sampled, the chunk-overlap check compares token
+# ids instead of strings, and generation stops on the first label token.
+
+from __future__ import annotations
+
+import codecs
+from typing import TYPE_CHECKING, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+if TYPE_CHECKING:
+    from llama_cpp import Llama
+
+RISK_LABELS = ("Low", "Medium", "High")
+OVERLAP_WINDOW = 30
+
+def continuation_prompt(prompt: str, so_far: str) -> str:
+    # prompt for the next chunk: the scan prompt plus the text generated so far
+    return prompt + "\n\nAssistant so far:\n" + so_far + "\n\nContinue:"
+
+def label_first_tokens(llm: Llama) -> Dict[str, List[int]]:
+    # First token of each spelling the model might open its answer with.
+    # Tokens shared between labels are dropped so they cannot tip the argmax.
+    ids = {}
+    for label in RISK_LABELS:
+        first = set()
+        for variant in (label, " " + label, label.lower(), " " + label.lower(), label.upper()):
+            toks = llm.tokenize(variant.encode("utf-8"), add_bos=False)
+            if toks:
+                first.add(toks[0])
+        ids[label] = first
+    shared = {t for a in RISK_LABELS for b in RISK_LABELS if a < b for t in ids[a] & ids[b]}
+    return {label: sorted(ids[label] - shared) for label in RISK_LABELS}
+
+class _OverlapFilter:
+    # Drops the head of a continuation chunk when it repeats the tail of what
+    # was already emitted; when several repeats fit, the longest one goes.
+    # Tokens are held back only while they can still be part of such a
+    # repeat, so at most OVERLAP_WINDOW tokens are delayed.
+    def __init__(self, tail: Sequence[int]):
+        self.tail = list(tail[-OVERLAP_WINDOW:])
+        self.pending: List[int] = []
+        self.starts: Optional[List[int]] = None if self.tail else []
+        self.repeat = 0  # length of the longest repeat completed so far
+
+    def feed(self, tok: int) -> List[int]:
+        if self.starts == []:
+            return [tok]
+        if self.starts is None:
+            self.starts = [i for i, t in enumerate(self.tail) if t == tok]
+        else:
+            n = len(self.pending)
+            self.starts = [s for s in self.starts if s + n < len(self.tail) and self.tail[s + n] == tok]
+        self.pending.append(tok)
+        n = len(self.pending)
+        if any(s + n == len(self.tail) for s in self.starts):
+            # the held tokens repeat the tail; keep holding while a longer repeat is alive
+            self.repeat = n
+            self.starts = [s for s in self.starts if s + n < len(self.tail)]
+        if not self.starts:
+            return self.flush()
+        return []
+
+    def flush(self) -> List[int]:
+        out, self.pending, self.starts = self.pending[self.repeat:], [], []
+        self.repeat = 0
+        return out
+
+def stream_generate(llm: Llama, prompt: str, max_total_tokens: int = 256, chunk_tokens: int = 64,
+                    base_temperature: float = 0.18,
+                    patch: Optional[Callable[[str], Tuple[str, float]]] = None,
+                    should_stop: Optional[Callable[[], bool]] = None) -> Iterator[Dict[str, object]]:
+    # Yields {"token": text, "id": n} per emitted token, then a final
+    # {"done": True, "text": ..., "verdict": label-or-None, "tokens": n}.
+    # `patch` maps a chunk prompt to (prompt, temperature multiplier), e.g.
+    # PUNKD; `should_stop` is polled between tokens to cancel generation.
+    patch = patch or (lambda p: (p, 1.0))
+    label_of = {t: label for label, ids in label_first_tokens(llm).items() for t in ids}
+    eos = llm.token_eos()
+    emitted: List[int] = []
+    text_parts: List[str] = []
+    verdict = None
+    cur_prompt = prompt
+    budget = max_total_tokens
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+    def emit(ids: List[int]):
+        for t in ids:
+            piece = decoder.decode(llm.detokenize([t], prev_tokens=emitted or None))
+            emitted.append(t)
+            if piece:
+                text_parts.append(piece)
+                yield {"token": piece, "id": t}
+
+    while budget > 0 and verdict is None:
+        patched_prompt, mult = patch(cur_prompt)
+        temp = max(0.01, min(2.0, base_temperature * mult))
+        tokens = llm.tokenize(patched_prompt.encode("utf-8"), add_bos=True)
+        overlap = _OverlapFilter(emitted)
+        produced = 0
+        words_before = len("".join(text_parts).split())
+        for tok in llm.generate(tokens, temp=temp):
+            if should_stop is not None and should_stop():
+                budget = 0
+                break
+            produced += 1
+            if tok == eos:
+                break
+            if tok in label_of:
+                yield from emit(overlap.flush())
+                verdict = label_of[tok]
+                break
+            piece = llm.detokenize([tok]).decode("utf-8", "ignore")
+            if "\n" in piece or "\r" in piece:
+                break
+            yield from emit(overlap.feed(tok))
+            if produced >= min(chunk_tokens, budget):
+                break
+        yield from emit(overlap.flush())
+        budget -= produced
+        new_words = len("".join(text_parts).split()) - words_before
+        if verdict is not None or produced == 0 or new_words < max(4, chunk_tokens // 10):
+            break
+        cur_prompt = continuation_prompt(prompt, "".join(text_parts).strip())
+
+    text = ("".join(text_parts) + decoder.decode(b"", final=True)).strip()
+    yield {"done": True, "text": text, "verdict": verdict, "tokens": len(emitted)}
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# python-backend/verdict_cache.py
+# Verdict cache for repeated scans of the same stretch of road. The scan
+# prompt depends only on the coordinates, the system metrics and the entropy
+# text, so a verdict is reused for the same geohash cell, the same metric
+# buckets and the same entropy band until it is `ttl` seconds old. Entries
+# are LRU-evicted past `max_entries` and can be sealed to disk (AES-GCM under
+# the app key). A miss may still be answered from a fresh entry in a nearby
+# cell while the caller refreshes the exact one in the background.
+
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Set, Tuple
+
+from geohash import cells_covering, covering_size, geohash_encode, haversine_m
+
+TTL = float(os.environ.get("QRS_CACHE_TTL", "300"))
+MAX_ENTRIES = int(os.environ.get("QRS_CACHE_SIZE", "1024"))
+PRECISION = int(os.environ.get("QRS_CACHE_PRECISION", "7"))       # ~150 m cells
+BUCKET = float(os.environ.get("QRS_CACHE_BUCKET", "0.1"))          # metric / score bucket width
+NEIGHBOR_M = float(os.environ.get("QRS_CACHE_NEIGHBOR_M", "150"))  # 0 disables neighbour answers
+SAVE_INTERVAL = 30.0
+NONCE_SIZE = 12
+_AAD = b"qrs-verdict-cache"
+METRIC_KEYS = ("cpu", "mem", "load1", "temp", "proc")
+# result fields that describe one particular run rather than the verdict
+_UNCACHED = ("timings", "cached", "neighbor_m", "age_s", "model")
+
+Entry = Tuple[float, float, float, Dict[str, object]]  # ts, lat, lon, result
+
+class VerdictCache:
+    def __init__(self, ttl: float = TTL, max_entries: int = MAX_ENTRIES, precision: int = PRECISION,
+                 bucket: float = BUCKET, path: Optional[Path] = None, key: Optional[bytes] = None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.precision = precision
+        self.bucket = bucket
+        self.path = Path(path) if path else None
+        self.key = key
+        self.stats = {"hits": 0, "misses": 0, "neighbor_hits": 0, "expired": 0, "evictions": 0, "refreshes": 0}
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Entry]" = OrderedDict()
+        self._refreshing: Set[str] = set()
+        self._saved_at = time.monotonic()
+        self._dirty = False
+        if self.path is not None and self.key is not None:
+            self.load()
+
+    # --- keys ---
+    def scene_signature(self, metrics: Dict[str, float], score: float, entropy_text: str, mode: str) -> str:
+        buckets = ",".join(str(int(round(float(metrics.get(k, 0.0)) / self.bucket))) for k in METRIC_KEYS)
+        band = entropy_text.split(" ", 1)[0]
+        return f"{mode}|{band}|{int(round(score / self.bucket))}|{buckets}"
+
+    def scene_key(self, lat: float, lon: float, metrics: Dict[str, float], score: float, entropy_text: str,
+                  mode: str) -> str:
+        return f"{geohash_encode(lat, lon, self.precision)}|{self.scene_signature(metrics, score, entropy_text, mode)}"
+
+    # --- lookup ---
+    def _fresh(self, key: str, now: float) -> Optional[Entry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if now - entry[0] > self.ttl:
+            del self._entries[key]
+            self.stats["expired"] += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def lookup(self, lat: float, lon: float, metrics: Dict[str, float], score: float, entropy_text: str,
+               mode: str, neighbor_m: float = NEIGHBOR_M) -> Tuple[str, Optional[Dict[str, object]]]:
+        # (key, result). A neighbour answer carries "neighbor_m"; the caller
+        # should refresh `key` in the background when it sees one.
+        key = self.scene_key(lat, lon, metrics, score, entropy_text, mode)
+        now = time.time()
+        with self._lock:
+            entry = self._fresh(key, now)
+            if entry is not None:
+                self.stats["hits"] += 1
+                return key, {**entry[3], "cached": True, "age_s": round(now - entry[0], 1)}
+            if neighbor_m > 0:
+                sig = key.split("|", 1)[1]
+                best = None
+                # near a pole the covering cells outnumber the entries; walk those instead
+                if covering_size(lat, lon, neighbor_m, self.precision) > len(self._entries):
+                    keys = [k for k in self._entries if k.split("|", 1)[1] == sig]
+                else:
+                    keys = [f"{cell}|{sig}" for cell in cells_covering(lat, lon, neighbor_m, self.precision)]
+                for k in keys:
+                    cand = self._fresh(k, now)
+                    if cand is None:
+                        continue
+                    d = haversine_m(lat, lon, cand[1], cand[2])
+                    if d <= neighbor_m and (best is None or d < best[0]):
+                        best = (d, cand)
+                if best is not None:
+                    self.stats["neighbor_hits"] += 1
+                    d, cand = best
+                    return key, {**cand[3], "cached": True, "neighbor_m": round(d, 1), "age_s": round(now - cand[0], 1)}
+            self.stats["misses"] += 1
+            return key, None
+
+    def put(self, key: str, lat: float, lon: float, result: Dict[str, object], ts: Optional[float] = None):
+        if result.get("verdict") in (None, "ERROR"):
+            return
+        clean = {k: v for k, v in result.items() if k not in _UNCACHED}
+        with self._lock:
+            self._entries[key] = (time.time() if ts is None else ts, lat, lon, clean)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+            self._dirty = True
+            due = self.path is not None and time.monotonic() - self._saved_at >= SAVE_INTERVAL
+        if due:
+            self.save()
+
+    # --- background refresh bookkeeping ---
+    def claim_refresh(self, key: str) -> bool:
+        # True for the one caller that should refresh `key`.
+        with self._lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+            self.stats["refreshes"] += 1
+            return True
+
+    def release_refresh(self, key: str):
+        with self._lock:
+            self._refreshing.discard(key)
+
+    # --- persistence ---
+    def save(self):
+        if self.path is None or self.key is None:
+            return
+        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+        with self._lock:
+            now = time.time()
+            rows = [[k, *e] for k, e in self._entries.items() if now - e[0] <= self.ttl]
+            self._dirty = False
+            self._saved_at = time.monotonic()
+        nonce = os.urandom(NONCE_SIZE)
+        blob = AESGCM(self.key).encrypt(nonce, json.dumps(rows, separators=(",", ":")).encode(), _AAD)
+        tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp.write_bytes(nonce + blob)
+            os.replace(tmp, self.path)
+        except OSError:
+            tmp.unlink(missing_ok=True)
+
+    def load(self) -> int:
+        if self.path is None or self.key is None or not self.path.exists():
+            return 0
+        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+        try:
+            raw = self.path.read_bytes()
+            rows = json.loads(AESGCM(self.key).decrypt(raw[:NONCE_SIZE], raw[NONCE_SIZE:], _AAD))
+        except Exception:
+            return 0  # unreadable or sealed under another key: start empty
+        now = time.time()
+        with self._lock:
+            for k, ts, lat, lon, result in sorted(rows, key=lambda r: r[1]):
+                if now - ts <= self.ttl:
+                    self._entries[k] = (ts, lat, lon, result)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return len(self._entries)
+
+    def flush(self):
+        if self._dirty:
+            self.save()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._dirty = True
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# python-backend/worker_pool.py
+# Process pool of N model workers for scan_server.py. The parent decrypts the
+# model once; every worker maps that same copy (/proc/<parent>/fd/N for the
+# memfd), so the weights sit in the page cache once however many workers
+# run, and each worker keeps its own Llama resident with its share of the
+# cores (inference_config.inference_params(workers)).
+
+import os
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing.util import Finalize
+from pathlib import Path
+from typing import Dict, Optional
+
+import main as backend
+
+WORKERS = int(os.environ.get("QRS_SERVER_WORKERS", "1"))
+WARM_TIMEOUT_S = 600.0
+_WARM_BARRIER = None  # set per worker by _init_worker; one party per worker
+
+# --- worker side ---
+def _init_worker(model_path: str, fingerprint: Optional[bytes], workers: int, history: bool, barrier):
+    global _WARM_BARRIER
+    _WARM_BARRIER = barrier
+    backend.attach_shared_model(Path(model_path), fingerprint)
+    backend.MODEL_MANAGER.workers = workers
+    if history:
+        h = backend.enable_history()
+        if h is not None:
+            Finalize(h, h.close, exitpriority=10)
+    backend.warm_model()
+
+def _scan(lat: float, lon: float, mode: str, timings: bool) -> Dict[str, object]:
+    return backend.run_quantum_scan(lat, lon, mode, timings)
+
+def _ping() -> int:
+    # holds this worker until every worker has picked up a ping, so each of
+    # the `workers` pings lands on a different process
+    _WARM_BARRIER.wait(WARM_TIMEOUT_S)
+    return os.getpid()
+
+# --- parent side ---
+class WorkerPool:
+    def __init__(self, workers: int = WORKERS, history: bool = True):
+        self.workers = max(1, workers)
+        self.history = history
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def start(self) -> bool:
+        # Decrypts in this process and spawns the workers; False when there is
+        # no model to share.
+        path = backend.decrypt_model()
+        if path is None:
+            return False
+        # spawn, not fork: the parent already runs the sampler, history and
+        # event-loop threads
+        ctx = multiprocessing.get_context("spawn")
+        self._executor = ProcessPoolExecutor(
+            self.workers, mp_context=ctx, initializer=_init_worker,
+            initargs=(str(path), backend.MODEL_MANAGER.fingerprint, self.workers, self.history,
+                      ctx.Barrier(self.workers)))
+        # workers are spawned on demand and warm in their initializer: one
+        # ping per worker starts and warms them all before the first scan
+        for f in [self._executor.submit(_ping) for _ in range(self.workers)]:
+            f.result()
+        return True
+
+    @property
+    def running(self) -> bool:
+        return self._executor is not None
+
+    def submit(self, lat: float, lon: float, mode: str = backend.SCAN_MODE, timings: bool = False) -> Future:
+        return self._executor.submit(_scan, lat, lon, mode, timings)
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None